@@ -19,44 +19,188 @@
 # limitations under the License.
 
 import argparse
+import hashlib
+import json
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 DEFAULT_DIRS = ['.']
 EXCLUDE_DIRS = ['node_modules']
 DEFAULT_EXTENSIONS = ["js", "ts", "py"]
+# The copyright notice is expected in the header of the file, only this many
+# bytes are read from each file.
+HEADER_SIZE = 4096
+DEFAULT_CACHE_FILE = '.copyright_header_cache.json'
+# Bumped when the format of the cache or the way files are checked changes.
+CACHE_VERSION = 1
+# Below this number of files, starting a process pool costs more than it saves.
+MIN_FILES_FOR_POOL = 512
 
 COPYRIGHT_REGEX = re.compile(r"Copyright [0-9]{4} Espressif Systems \(Shanghai\) CO\.? LTD\.?",
                              flags=re.MULTILINE | re.IGNORECASE)
 
 
-def contain_copyright_message(file_path):
-    with open(file_path) as fp:
-        data = fp.read()
-        return COPYRIGHT_REGEX.search(data)
+def read_header(file_path, header_size=HEADER_SIZE):
+    with open(file_path, 'rb') as fp:
+        return fp.read(header_size)
+
+
+def contain_copyright_message(file_path, header_size=HEADER_SIZE):
+    data = read_header(file_path, header_size).decode('utf-8', errors='ignore')
+    return COPYRIGHT_REGEX.search(data)
+
+
+def _header_contains_copyright(header):
+    return bool(COPYRIGHT_REGEX.search(header.decode('utf-8', errors='ignore')))
+
+
+def _check_file(file_path, header_size, with_hash):
+    header = read_header(file_path, header_size)
+    ok = _header_contains_copyright(header)
+    return (ok, hashlib.sha1(header).hexdigest()) if with_hash else ok
+
+
+def _check_chunk(file_paths, header_size, with_hash=False):
+    return [_check_file(file_path, header_size, with_hash) for file_path in file_paths]
 
 
 def scan_for_all_files_with_extension(dirs, exclude_dirs, exts):
+    """Returns the files under |dirs| whose extension is one of |exts|.
+
+    Excluded directories are pruned from the walk. An exclude entry without a
+    path separator, like 'node_modules', excludes directories of that name
+    anywhere, others exclude that path.
+    """
+    exts = {ext if ext.startswith('.') else '.' + ext for ext in exts}
+    exclude_names = {d for d in exclude_dirs if os.sep not in d and '/' not in d}
+    exclude_paths = {os.path.normpath(d) for d in exclude_dirs}
     coll = []
     for folder in dirs:
+        if os.path.normpath(folder) in exclude_paths:
+            continue
         for root, _dirs, files in os.walk(folder):
-            if root in exclude_dirs:
-                continue
-
-            for file in files:
-                coll.extend([os.path.join(root, file) for ext in exts if file.endswith(ext)])
+            _dirs[:] = [d for d in _dirs
+                        if d not in exclude_names and os.path.normpath(os.path.join(root, d)) not in exclude_paths]
+            coll.extend(os.path.join(root, file) for file in files if os.path.splitext(file)[1] in exts)
     return coll
 
 
+def check_files(files, jobs=None, header_size=HEADER_SIZE, with_hash=False):
+    """Returns whether each of |files| contains the copyright notice, checking
+    them across a process pool when there are enough of them. With
+    |with_hash|, returns (result, hash of the header) pairs instead, from the
+    same read."""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) < MIN_FILES_FOR_POOL:
+        return _check_chunk(files, header_size, with_hash)
+    # Hand out a few chunks per worker to amortize the inter-process overhead
+    # while keeping the load balanced.
+    chunk_size = max(1, len(files) // (jobs * 4))
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(_check_chunk, chunks, [header_size] * len(chunks), [with_hash] * len(chunks))
+        return [result for chunk in results for result in chunk]
+
+
+def _cache_key(header_size):
+    """Returns what the cached results depend on besides the files."""
+    return {'version': CACHE_VERSION, 'header_size': header_size, 'pattern': COPYRIGHT_REGEX.pattern}
+
+
+def load_cache(cache_file, header_size=HEADER_SIZE):
+    """Returns the cached entries of each file, or an empty cache when it was
+    written by another version or with another header size."""
+    try:
+        with open(cache_file) as fp:
+            data = json.load(fp)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('key') != _cache_key(header_size):
+        return {}
+    return data.get('files', {})
+
+
+def save_cache(cache_file, cache, header_size=HEADER_SIZE):
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w') as fp:
+        json.dump({'key': _cache_key(header_size), 'files': cache}, fp)
+    os.replace(tmp_file, cache_file)
+
+
+def check_changed_files(files, cache, jobs=None, header_size=HEADER_SIZE):
+    """Like check_files, but reuses the results in |cache| for the files that
+    did not change since they were cached, and updates it.
+
+    A file is unchanged when its mtime and size are the same, or when only its
+    mtime changed (e.g. after a checkout) and its header hashes the same.
+    Every header is read once: the ones hashed to find out are checked right
+    away when they changed, the others are checked and hashed by check_files.
+    Returns the results, the number of files checked and whether |cache| was
+    updated.
+    """
+    results = {}
+    changed = []
+    stats = {}
+    checked = 0
+    updated = False
+    for file_path in files:
+        stat = os.stat(file_path)
+        stats[file_path] = stat
+        entry = cache.get(file_path)
+        if entry and entry['size'] == stat.st_size:
+            if entry['mtime'] == stat.st_mtime_ns:
+                results[file_path] = entry['ok']
+                continue
+            header = read_header(file_path, header_size)
+            digest = hashlib.sha1(header).hexdigest()
+            if entry['hash'] != digest:
+                entry['ok'] = _header_contains_copyright(header)
+                entry['hash'] = digest
+                checked += 1
+            entry['mtime'] = stat.st_mtime_ns
+            updated = True
+            results[file_path] = entry['ok']
+            continue
+        changed.append(file_path)
+    for file_path, (ok, digest) in zip(changed, check_files(changed, jobs, header_size, with_hash=True)):
+        stat = stats[file_path]
+        cache[file_path] = {
+            'mtime': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'hash': digest,
+            'ok': ok,
+        }
+        results[file_path] = ok
+    # Forget the files that are gone or no longer checked.
+    for file_path in set(cache) - set(stats):
+        del cache[file_path]
+        updated = True
+    return [results[file_path] for file_path in files], checked + len(changed), updated or bool(changed)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Checker for copyright notice')
     parser.add_argument('-d', '--dirs', help="Directories to check for files", default=DEFAULT_DIRS, nargs="+")
     parser.add_argument('-x', '--exclude', help="Directories to exclude", default=EXCLUDE_DIRS, nargs="+")
     parser.add_argument('-e', '--extensions', help="File extensions to check", default=DEFAULT_EXTENSIONS, nargs="+")
+    parser.add_argument('-j', '--jobs', help="Number of processes checking files", type=int, default=None)
+    parser.add_argument('--header-size', help="Number of bytes read from the start of each file", type=int,
+                        default=HEADER_SIZE)
+    parser.add_argument('--changed-only', help="Only check the files changed since the previous run",
+                        action='store_true')
+    parser.add_argument('--cache-file', help="Cache used by --changed-only", default=DEFAULT_CACHE_FILE)
 
     args = parser.parse_args()
     files = scan_for_all_files_with_extension(args.dirs, args.exclude, args.extensions)
-    missing_copyright_files = [file_path for file_path in files if not contain_copyright_message(file_path)]
+    if args.changed_only:
+        cache = load_cache(args.cache_file, args.header_size)
+        results, _, updated = check_changed_files(files, cache, args.jobs, args.header_size)
+        if updated:
+            save_cache(args.cache_file, cache, args.header_size)
+    else:
+        results = check_files(files, args.jobs, args.header_size)
+    missing_copyright_files = [file_path for file_path, ok in zip(files, results) if not ok]
 
     if missing_copyright_files:
         for file in missing_copyright_files:
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+# 'copyright_header_checker_benchmark.py' benchmarks copyright_header_checker.py
+#
+# Project: ESP-IDF VSCode Extension
+# Copyright 2026 Espressif Systems (Shanghai) CO LTD
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" Benchmarks copyright_header_checker.py on a generated source tree
+
+    The tree has the given number of files, part of them in a node_modules
+    directory, with a few large files and a few files missing the copyright
+    notice. It is scanned with the previous implementation (full walk, full
+    reads, serial), with the current one using a single process and the
+    process pool, and with --changed-only against a cold and a warm cache.
+    Timings are taken with the tree in the page cache.
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import tempfile
+import time
+
+import copyright_header_checker as checker
+
+HEADER = "// Copyright 2019 Espressif Systems (Shanghai) CO LTD\n"
+LICENSE = "// Licensed under the Apache License, Version 2.0 (the \"License\");\n" * 12
+FILE_NAMES = ["index.ts", "main.js", "utils.py", "view.vue", "package.json", "README.md", "charts", "types.d.ts"]
+
+
+def generate_tree(root, file_count, seed):
+    rng = random.Random(seed)
+    body = "const value = 42;\n" * 64
+    large_body = body * 64
+    for i in range(file_count):
+        top = "node_modules" if rng.random() < 0.4 else "src"
+        folder = os.path.join(root, top, "pkg%d" % (i % 997), "dir%d" % (i % 13))
+        os.makedirs(folder, exist_ok=True)
+        name = "%d_%s" % (i, rng.choice(FILE_NAMES))
+        header = "" if rng.random() < 0.01 else HEADER
+        with open(os.path.join(folder, name), "w") as fp:
+            fp.write(header + LICENSE + (large_body if rng.random() < 0.01 else body))
+
+
+def legacy_scan(dirs, exclude_dirs, exts):
+    """The previous implementation of the checker."""
+    coll = []
+    for folder in dirs:
+        for root, _dirs, files in os.walk(folder):
+            if root in exclude_dirs:
+                continue
+            for file in files:
+                coll.extend([os.path.join(root, file) for ext in exts if file.endswith(ext)])
+    missing = []
+    for file_path in coll:
+        with open(file_path) as fp:
+            if not checker.COPYRIGHT_REGEX.search(fp.read()):
+                missing.append(file_path)
+    return missing
+
+
+def scan(dirs, exclude_dirs, exts, jobs):
+    files = checker.scan_for_all_files_with_extension(dirs, exclude_dirs, exts)
+    return [f for f, ok in zip(files, checker.check_files(files, jobs)) if not ok]
+
+
+def scan_changed(dirs, exclude_dirs, exts, cache_file):
+    files = checker.scan_for_all_files_with_extension(dirs, exclude_dirs, exts)
+    cache = checker.load_cache(cache_file)
+    results, checked, updated = checker.check_changed_files(files, cache)
+    if updated:
+        checker.save_cache(cache_file, cache)
+    return [f for f, ok in zip(files, results) if not ok], checked
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print("%-28s %8.2f s" % (label, time.perf_counter() - start))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark for the copyright notice checker')
+    parser.add_argument('-n', '--files', help="Number of files to generate", type=int, default=100000)
+    parser.add_argument('--seed', help="Seed of the generated tree", type=int, default=1)
+    parser.add_argument('--keep-dir', help="Directory where the generated tree is kept")
+
+    args = parser.parse_args()
+    work_dir = args.keep_dir or tempfile.mkdtemp(prefix="copyright-")
+    try:
+        if not os.path.isdir(os.path.join(work_dir, "src")):
+            timed("generate %d files" % args.files, generate_tree, work_dir, args.files, args.seed)
+        dirs = [work_dir]
+        exclude_dirs = [os.path.join(work_dir, "node_modules")]
+        exts = checker.DEFAULT_EXTENSIONS
+        cache_file = os.path.join(work_dir, checker.DEFAULT_CACHE_FILE)
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+
+        # Warm the page cache so that the first timing is comparable.
+        checker.scan_for_all_files_with_extension(dirs, [], exts)
+        legacy = timed("legacy", legacy_scan, dirs, exclude_dirs, exts)
+        serial = timed("current, 1 process", scan, dirs, exclude_dirs, exts, 1)
+        parallel = timed("current, %d processes" % (os.cpu_count() or 1), scan, dirs, exclude_dirs, exts, None)
+        cold, cold_changed = timed("--changed-only, cold cache", scan_changed, dirs, exclude_dirs, exts, cache_file)
+        warm, warm_changed = timed("--changed-only, warm cache", scan_changed, dirs, exclude_dirs, exts, cache_file)
+
+        assert serial == parallel == cold == warm, "the checker modes disagree"
+        assert warm_changed == 0, "%d files checked again with a warm cache" % warm_changed
+        # The legacy scan also checks node_modules and loosely matched names.
+        in_scope = re.compile(r"^(?!.*node_modules).*\.(js|ts|py)$")
+        assert sorted(f for f in legacy if in_scope.match(f)) == sorted(serial), "legacy and current disagree"
+        print("%d files missing the copyright notice, %d reported by legacy" % (len(serial), len(legacy)))
+    finally:
+        if not args.keep_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
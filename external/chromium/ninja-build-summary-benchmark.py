@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# Copyright 2026 Espressif Systems (Shanghai) CO LTD
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the engines of ninja-build-summary.py on synthetic logs.
+For every requested size a .ninja_log with that many build steps is generated
+and summarized with both engines:
+  python: ReadTargets (one Target per step) + the pure-Python sweep.
+  numpy:  ReadTargetTable (columnar) + the vectorized NumPy sweep.
+Parse time, summarize time (and the part of it spent in the weighted-duration
+sweep alone) and peak memory (measured with tracemalloc in a
+separate pass, since tracing slows everything down) are reported per engine,
+together with the largest difference between the weighted durations computed
+by both engines.
+> python3 ninja-build-summary-benchmark.py --steps 10000,100000,1000000"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+def LoadSummaryModule():
+    """Imports ninja-build-summary.py, whose name is not a valid module name."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'ninja-build-summary.py')
+    spec = importlib.util.spec_from_file_location('ninja_build_summary', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+summary = LoadSummaryModule()
+def GenerateLog(path, steps, jobs, seed):
+    """Writes a single-build .ninja_log with |steps| steps run by |jobs|
+    parallel workers. Durations are mostly short compiles with a few long
+    archive and link steps, like an ESP-IDF build."""
+    rng = random.Random(seed)
+    records = []
+    lane_ends = [0] * jobs
+    for i in range(steps):
+      lane = i % jobs
+      roll = rng.random()
+      if roll < 0.001:
+        duration, name = rng.randint(5000, 60000), 'app%d.elf' % i
+      elif roll < 0.05:
+        duration, name = (rng.randint(50, 2000),
+                          'esp-idf/comp%d/libcomp%d.a' % (i % 97, i))
+      else:
+        duration, name = (rng.randint(20, 8000),
+                          'esp-idf/comp%d/CMakeFiles/__idf_comp%d.dir/'
+                          'src/file%d.c.obj' % (i % 97, i % 97, i))
+      start = lane_ends[lane] + rng.randint(0, 5)
+      lane_ends[lane] = end = start + duration
+      records.append((end, start, name, '%016x' % rng.getrandbits(64)))
+    # Records are written when commands complete, so end times are in order.
+    records.sort()
+    with open(path, 'w') as log:
+      log.write(summary.NINJA_LOG_HEADER)
+      for end, start, name, cmdhash in records:
+        log.write('%d\t%d\t0\t%s\t%s\n' % (start, end, name, cmdhash))
+def RunEngine(log_file, engine):
+    """Parses and summarizes |log_file| with |engine|. Returns the parse,
+    summarize and weighted-duration sweep times in seconds and the weighted
+    durations."""
+    with contextlib.redirect_stdout(io.StringIO()):
+      parse_start = time.perf_counter()
+      with open(log_file, 'r') as log:
+        if engine == 'numpy':
+          table = summary.ReadTargetTable(log, False)
+        else:
+          table = summary.TargetTable.FromTargets(
+              summary.ReadTargets(log, False))
+      summarize_start = time.perf_counter()
+      weighted = summary.SummarizeTable(table, None, engine)
+      summarize_end = time.perf_counter()
+      summary.ComputeWeightedDurations(table, engine)
+      sweep_end = time.perf_counter()
+    return (summarize_start - parse_start, summarize_end - summarize_start,
+            sweep_end - summarize_end, weighted)
+def PeakMemory(log_file, engine):
+    """Returns the peak memory traced while running |engine|, in bytes."""
+    tracemalloc.start()
+    try:
+      RunEngine(log_file, engine)
+      return tracemalloc.get_traced_memory()[1]
+    finally:
+      tracemalloc.stop()
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--steps', default='10000,100000,1000000,5000000',
+                        help='comma separated numbers of build steps.')
+    parser.add_argument('-j', '--jobs', type=int, default=16,
+                        help='parallelism of the simulated builds.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the (slow) tracemalloc pass.')
+    parser.add_argument('--keep-dir',
+                        help='directory where the generated logs are kept.')
+    args = parser.parse_args()
+    engines = ['python']
+    if summary.np is not None:
+      engines.append('numpy')
+    else:
+      print('NumPy is not installed, only benchmarking the python engine.')
+    work_dir = args.keep_dir or tempfile.mkdtemp(prefix='ninja-summary-')
+    os.makedirs(work_dir, exist_ok=True)
+    print('%10s %7s %10s %12s %8s %10s %14s' % ('steps', 'engine', 'parse s',
+          'summarize s', 'sweep s', 'peak MiB', 'max |delta| s'))
+    try:
+      for steps in [int(s) for s in args.steps.split(',')]:
+        log_file = os.path.join(work_dir, 'ninja_log_%d' % steps)
+        GenerateLog(log_file, steps, args.jobs, args.seed)
+        reference = None
+        for engine in engines:
+          parse_time, summarize_time, sweep_time, weighted = RunEngine(
+              log_file, engine)
+          weighted = list(weighted)
+          if reference is None:
+            reference = weighted
+          delta = max(abs(a - b) for a, b in zip(reference, weighted))
+          assert delta <= summary.WEIGHTED_EPSILON, \
+                 '%s engine differs by %g s' % (engine, delta)
+          del weighted
+          peak = '-' if args.no_memory else '%.1f' % (
+              PeakMemory(log_file, engine) / (1024.0 * 1024.0))
+          print('%10d %7s %10.2f %12.2f %8.2f %10s %14.2g' % (
+                steps, engine, parse_time, summarize_time, sweep_time, peak,
+                delta))
+        if not args.keep_dir:
+          os.remove(log_file)
+    finally:
+      if not args.keep_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+if __name__ == '__main__':
+    sys.exit(main())
@@ -41,16 +41,86 @@ will have a weighted time that is the same or similar to its elapsed time. A
 compile that runs in parallel with 999 other compiles will have a weighted time
 that is tiny."""
 import argparse
+import array
+import collections
 import errno
 import fnmatch
+import functools
+import hashlib
+import heapq
+import json
 import os
+import re
+import statistics
 import sys
+import time
+try:
+  import numpy as np
+except ImportError:
+  # The vectorized engine is optional, the pure-Python one is always available.
+  np = None
 # The number of long build times to report:
 long_count = 10
 # The number of long times by extension to report
 long_ext_count = 10
+# The number of long times by ESP-IDF component to report
+long_component_count = 10
+NINJA_LOG_HEADER = '# ninja log v5\n'
+# Suffix of the file, next to .ninja_log, holding the state of the last parse.
+CHECKPOINT_SUFFIX = '.summary_checkpoint'
+CHECKPOINT_VERSION = 1
+# Number of bytes before the checkpoint offset that must be unchanged for the
+# checkpoint to be trusted.
+CHECKPOINT_ANCHOR_SIZE = 512
+# Allowed floating-point error between weighted and elapsed durations.
+WEIGHTED_EPSILON = 0.000002
+ENGINES = ('auto', 'python', 'numpy')
+# Rules mapping the directory of an output, with a trailing '/', to the
+# ESP-IDF component that produced it. They are tried in order, as the
+# alternatives of a single regular expression.
+COMPONENT_RULES = re.compile(
+    # Objects of a component: CMakeFiles/__idf_<component>.dir/...
+    r'(?:.*/)?CMakeFiles/__idf_(?P<idf>[^/]+)\.dir/'
+    # Anything built from the managed_components directory.
+    r'|(?:.*/)?managed_components/(?P<managed>[^/]+)/'
+    # Archives and generated files of a component: esp-idf/<component>/...
+    r'|esp-idf/(?P<component>[^/]+)/'
+    # Objects of the application itself: CMakeFiles/<project>.elf.dir/...
+    r'|(?:.*/)?CMakeFiles/[^/]+\.elf\.dir/(?P<app>)'
+    # Everything else is grouped by its top-level directory, e.g. bootloader
+    # (and bootloader-prefix), partition_table or config.
+    r'|(?P<top>[^/]+?)(?:-prefix)?/')
+# Build-step phase of each output extension. Others are 'other'.
+PHASES = {
+    'o': 'compile',
+    'obj': 'compile',
+    'a': 'archive',
+    'elf': 'link',
+    'map': 'link',
+}
+# Size, in seconds of build time, of the buckets used by --follow.
+FOLLOW_BUCKET_SIZE = 0.1
+# Seconds of build time over which --follow reports the current rate.
+FOLLOW_WINDOW = 10.0
+# Longest steps (by elapsed time) whose weighted time --follow tracks, and
+# how many of them it reports.
+FOLLOW_CANDIDATES = 32
+FOLLOW_SLOWEST_COUNT = 3
+# Seconds between checks of the log file when inotify is not available.
+FOLLOW_POLL_INTERVAL = 0.5
+# Relative wall-time gain below which --simulate-jobs considers that more
+# jobs stop helping.
+SIMULATION_MIN_GAIN = 0.05
+# Name of the --history database, next to .ninja_log, by default.
+HISTORY_FILE = '.ninja_summary_history.db'
+# Elapsed time, in seconds, below which a slower step is not reported as a
+# regression, to filter out noise on short steps.
+HISTORY_MIN_REGRESSION = 0.5
+APP_COMPONENT = '(app)'
+OTHER_COMPONENT = '(other)'
 class Target:
     """Represents a single line read for a .ninja_log file."""
+    __slots__ = ('start', 'end', 'targets', 'weighted_duration')
     def __init__(self, start, end):
         """Creates a target object by passing in the start/end times in seconds
         as a float."""
@@ -75,75 +145,276 @@ class Target:
         weighted_duration should always be the same or shorter than duration.
         """
         # Allow for modest floating-point errors
-        epsilon = 0.000002
-        if (self.weighted_duration > self.Duration() + epsilon):
+        if (self.weighted_duration > self.Duration() + WEIGHTED_EPSILON):
           print('%s > %s?' % (self.weighted_duration, self.Duration()))
-        assert(self.weighted_duration <= self.Duration() + epsilon)
+        assert(self.weighted_duration <= self.Duration() + WEIGHTED_EPSILON)
         return self.weighted_duration
     def DescribeTargets(self):
         """Returns a printable string that summarizes the targets."""
-        # Some build steps generate dozens of outputs - handle them sanely.
-        # The max_length was chosen so that it can fit most of the long
-        # single-target names, while minimizing word wrapping.
-        result = ', '.join(self.targets)
-        max_length = 65
-        if len(result) > max_length:
-          result = result[:max_length] + '...'
-        return result
-# Copied with some modifications from ninjatracing
-def ReadTargets(log, show_all):
-    """Reads all targets from .ninja_log file |log_file|, sorted by duration.
-    The result is a list of Target objects."""
-    header = log.readline()
-    assert header == '# ninja log v5\n', \
-           'unrecognized ninja log version %r' % header
-    targets_dict = {}
-    last_end_seen = 0.0
-    for line in log:
-        parts = line.strip().split('\t')
-        if len(parts) != 5:
-          # If ninja.exe is rudely halted then the .ninja_log file may be
-          # corrupt. Silently continue.
-          continue
-        start, end, _, name, cmdhash = parts # Ignore restat.
-        # Convert from integral milliseconds to float seconds.
-        start = int(start) / 1000.0
-        end = int(end) / 1000.0
-        if not show_all and end < last_end_seen:
+        return DescribeOutputs(self.targets)
+def DescribeOutputs(outputs):
+    """Returns a printable string that summarizes a list of outputs."""
+    # Some build steps generate dozens of outputs - handle them sanely.
+    # The max_length was chosen so that it can fit most of the long
+    # single-target names, while minimizing word wrapping.
+    result = ', '.join(outputs)
+    max_length = 65
+    if len(result) > max_length:
+      result = result[:max_length] + '...'
+    return result
+class TargetTable:
+    """Columnar storage for the targets of a build. Start and end times live
+    in array('d') columns, and cmdhashes and outputs in parallel lists, which
+    is much more compact than one Target object per step on large logs. Row
+    |i| of every column describes the same build step."""
+    def __init__(self):
+        self.start = array.array('d')
+        self.end = array.array('d')
+        self.cmdhash = []
+        self.targets = []
+    def __len__(self):
+        return len(self.cmdhash)
+    def Clear(self):
+        """Drops all rows, keeping the column objects themselves."""
+        del self.start[:]
+        del self.end[:]
+        del self.cmdhash[:]
+        del self.targets[:]
+    @classmethod
+    def FromTargets(cls, entries):
+        """Builds a table from a list of Target objects."""
+        table = cls()
+        table.start.extend(target.start for target in entries)
+        table.end.extend(target.end for target in entries)
+        table.cmdhash = [None] * len(entries)
+        table.targets = [target.targets for target in entries]
+        return table
+    def Targets(self, weighted=None):
+        """Materializes the rows as a list of Target objects, optionally
+        setting their weighted durations."""
+        entries = []
+        for i in range(len(self)):
+          target = Target(self.start[i], self.end[i])
+          target.targets = self.targets[i]
+          if weighted is not None:
+            target.SetWeightedDuration(weighted[i])
+          entries.append(target)
+        return entries
+class TableParser:
+    """Parses .ninja_log records into a TargetTable while keeping only the
+    state needed to resume: the targets of the current build and the last
+    end time seen. |on_build_done|, if set, is called with the table of each
+    build that is followed by a new one, and a new table is started instead
+    of clearing it."""
+    def __init__(self, show_all, table=None, last_end_seen=0.0,
+                 on_build_done=None):
+        self.show_all = show_all
+        self.table = table if table is not None else TargetTable()
+        # Maps a cmdhash to its row in |table|.
+        self.rows = {cmdhash: row
+                     for row, cmdhash in enumerate(self.table.cmdhash)}
+        self.last_end_seen = last_end_seen
+        self.on_build_done = on_build_done
+    def _NewBuild(self):
+        """Hands the current build over to |on_build_done|, or forgets it."""
+        if self.on_build_done:
+          if len(self.table):
+            self.on_build_done(self.table)
+          self.table = TargetTable()
+        else:
+          self.table.Clear()
+        self.rows = {}
+    def ParseLines(self, lines):
+        """Feeds an iterable of log lines (without the header) to the
+        parser."""
+        show_all = self.show_all
+        table = self.table
+        starts, ends = table.start, table.end
+        cmdhashes, outputs = table.cmdhash, table.targets
+        rows = self.rows
+        last_end_seen = self.last_end_seen
+        for line in lines:
+            parts = line.strip().split('\t')
+            if len(parts) != 5:
+              # If ninja.exe is rudely halted then the .ninja_log file may be
+              # corrupt. Silently continue.
+              continue
+            start, end, _, name, cmdhash = parts # Ignore restat.
+            # Convert from integral milliseconds to float seconds.
+            start = int(start) / 1000.0
+            end = int(end) / 1000.0
+            row = rows.get(cmdhash)
             # An earlier time stamp means that this step is the first in a new
             # build, possibly an incremental build. Throw away the previous
             # data so that this new build will be displayed independently.
             # This has to be done by comparing end times because records are
             # written to the .ninja_log file when commands complete, so end
             # times are guaranteed to be in order, but start times are not.
-            targets_dict = {}
-        target = None
-        if cmdhash in targets_dict:
-          target = targets_dict[cmdhash]
-          if not show_all and (target.start != start or target.end != end):
             # If several builds in a row just run one or two build steps then
             # the end times may not go backwards so the last build may not be
-            # detected as such. However in many cases there will be a build step
-            # repeated in the two builds and the changed start/stop points for
-            # that command, identified by the hash, can be used to detect and
-            # reset the target dictionary.
-            targets_dict = {}
-            target = None
-        if not target:
-          targets_dict[cmdhash] = target = Target(start, end)
-        last_end_seen = end
-        target.targets.append(name)
-    return list(targets_dict.values())
+            # detected as such. However in many cases there will be a build
+            # step repeated in the two builds and the changed start/stop points
+            # for that command, identified by the hash, can be used to detect
+            # and reset the target table.
+            if not show_all and (end < last_end_seen or (
+                row is not None and (starts[row] != start or
+                                     ends[row] != end))):
+              self._NewBuild()
+              table = self.table
+              starts, ends = table.start, table.end
+              cmdhashes, outputs = table.cmdhash, table.targets
+              rows = self.rows
+              row = None
+            if row is None:
+              rows[cmdhash] = row = len(cmdhashes)
+              starts.append(start)
+              ends.append(end)
+              cmdhashes.append(cmdhash)
+              outputs.append([])
+            last_end_seen = end
+            outputs[row].append(name)
+        self.rows = rows
+        self.last_end_seen = last_end_seen
+# Copied with some modifications from ninjatracing
+def ReadTargets(log, show_all):
+    """Reads all targets from .ninja_log file |log_file|, sorted by duration.
+    The result is a list of Target objects."""
+    return ReadTargetTable(log, show_all).Targets()
+def ReadTargetTable(log, show_all):
+    """Same as ReadTargets, but stores the targets in a TargetTable rather
+    than in one Target object per step."""
+    header = log.readline()
+    assert header == NINJA_LOG_HEADER, \
+           'unrecognized ninja log version %r' % header
+    parser = TableParser(show_all)
+    parser.ParseLines(log)
+    return parser.table
+def CheckpointPath(log_file):
+    """Returns the path of the checkpoint file kept next to |log_file|."""
+    return log_file + CHECKPOINT_SUFFIX
+def _LogAnchor(log, offset):
+    """Returns a digest of the bytes just before |offset|, used to detect a
+    log that was rewritten in place to at least the same size."""
+    start = max(0, offset - CHECKPOINT_ANCHOR_SIZE)
+    log.seek(start)
+    return hashlib.sha1(log.read(offset - start)).hexdigest()
+def _LogUnchanged(saved, log, stat, header):
+    """Returns whether the part of |log| before the offset recorded in the
+    |saved| dictionary, along with 'header', 'inode' and 'anchor', is still
+    the one that was parsed."""
+    offset = saved['offset']
+    # Otherwise the log was truncated, recreated or recompacted by ninja.
+    return (saved['header'] == header and
+            saved['inode'] == stat.st_ino and
+            offset <= stat.st_size and
+            saved['anchor'] == _LogAnchor(log, offset))
+def _LoadCheckpoint(checkpoint_file, log, stat, header, show_all):
+    """Returns a (TableParser, offset) pair restored from |checkpoint_file|,
+    or None when there is no usable checkpoint for the current log."""
+    try:
+      with open(checkpoint_file, 'r') as f:
+        checkpoint = json.load(f)
+    except (IOError, OSError, ValueError):
+      return None
+    try:
+      offset = checkpoint['offset']
+      if (checkpoint['version'] != CHECKPOINT_VERSION or
+          checkpoint['show_all'] != show_all or
+          not _LogUnchanged(checkpoint, log, stat, header)):
+        return None
+      table = TargetTable()
+      for cmdhash, start, end, names in checkpoint['targets']:
+        table.start.append(start)
+        table.end.append(end)
+        table.cmdhash.append(cmdhash)
+        table.targets.append(names)
+      parser = TableParser(show_all, table, checkpoint['last_end_seen'])
+    except (KeyError, TypeError, ValueError):
+      return None
+    return parser, offset
+def _SaveCheckpoint(checkpoint_file, log, stat, header, show_all, parser,
+                    offset):
+    """Writes the parser state atomically. Failures are not fatal, the next
+    run simply does a full parse."""
+    table = parser.table
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'show_all': show_all,
+        'header': header,
+        'inode': stat.st_ino,
+        'offset': offset,
+        'anchor': _LogAnchor(log, offset),
+        'last_end_seen': parser.last_end_seen,
+        'targets': list(zip(table.cmdhash, table.start, table.end,
+                            table.targets)),
+    }
+    tmp_file = checkpoint_file + '.tmp'
+    try:
+      with open(tmp_file, 'w') as f:
+        # json.dumps uses the C encoder, json.dump does not.
+        f.write(json.dumps(checkpoint, separators=(',', ':')))
+      os.replace(tmp_file, checkpoint_file)
+    except (IOError, OSError):
+      try:
+        os.remove(tmp_file)
+      except OSError:
+        pass
+def ReadTargetTableIncremental(log_file, show_all, checkpoint_file=None):
+    """Like ReadTargetTable, but resumes from the checkpoint stored next to
+    |log_file| and only parses the records appended since the previous run.
+    Falls back to a full parse when the log was rewritten or truncated."""
+    if checkpoint_file is None:
+      checkpoint_file = CheckpointPath(log_file)
+    with open(log_file, 'rb') as log:
+      stat = os.fstat(log.fileno())
+      header = log.readline().decode('utf-8', 'replace')
+      assert header == NINJA_LOG_HEADER, \
+             'unrecognized ninja log version %r' % header
+      restored = _LoadCheckpoint(checkpoint_file, log, stat, header, show_all)
+      if restored:
+        parser, offset = restored
+      else:
+        parser, offset = TableParser(show_all), len(NINJA_LOG_HEADER)
+      log.seek(offset)
+      data = log.read()
+      # Only consume complete lines; ninja may be in the middle of appending
+      # a record, which will be picked up by the next run.
+      complete = data.rfind(b'\n') + 1
+      if complete:
+        parser.ParseLines(
+            data[:complete].decode('utf-8', 'replace').splitlines())
+        offset += complete
+      if not restored or complete:
+        _SaveCheckpoint(checkpoint_file, log, stat, header, show_all, parser,
+                        offset)
+    return parser.table
 def GetExtension(target, extra_patterns):
   """Return the file extension that best represents a target.
   For targets that generate multiple outputs it is important to return a
   consistent 'canonical' extension. Ultimately the goal is to group build steps
   by type."""
-  for output in target.targets:
+  return GetOutputsExtension(target.targets, extra_patterns)
+@functools.lru_cache(maxsize=None)
+def _StepTypesMatcher(extra_patterns):
+  """Compiles the semicolon separated fnmatch |extra_patterns| into a single
+  regular expression, whose 'p<i>' group tells which pattern matched first."""
+  patterns = extra_patterns.split(';')
+  matcher = re.compile('|'.join(
+      '(?P<p%d>%s)' % (i, fnmatch.translate(os.path.normcase(
+          '*' + fn_pattern + '*'))) for i, fn_pattern in enumerate(patterns)))
+  return matcher, patterns
+def GetOutputsExtension(outputs, extra_patterns):
+  """Same as GetExtension, for the list of outputs of a build step."""
+  if extra_patterns:
+    matcher, patterns = _StepTypesMatcher(extra_patterns)
+  for output in outputs:
     if extra_patterns:
-      for fn_pattern in extra_patterns.split(';'):
-        if fnmatch.fnmatch(output, '*' + fn_pattern + '*'):
-          return fn_pattern
+      # Equivalent to trying fnmatch.fnmatch with each pattern in turn.
+      match = matcher.match(os.path.normcase(output))
+      if match:
+        for i, fn_pattern in enumerate(patterns):
+          if match.group('p%d' % i) is not None:
+            return fn_pattern
     # Not a true extension, but a good grouping.
     if output.endswith('type_mappings'):
       extension = 'type_mappings'
@@ -175,98 +446,1291 @@ def GetExtension(target, extra_patterns):
       extension = 'mojo'
       break
   return extension
-def SummarizeEntries(entries, extra_step_types):
-    """Print a summary of the passed in list of Target objects."""
+class ComponentClassifier:
+    """Attributes build steps to the ESP-IDF component that produced them and
+    to a compile, archive, link or other phase. The component only depends on
+    the directory of an output and the phase on its extension, so both are
+    memoized and most outputs are classified with two dictionary lookups."""
+    def __init__(self):
+        self._component_by_dir = {}
+        self._phase_by_ext = {}
+    def _Component(self, directory):
+        if not directory:
+          # The build directory itself holds the application's outputs, like
+          # <project>.elf, <project>.bin and <project>.map.
+          return APP_COMPONENT
+        match = COMPONENT_RULES.match(directory + '/')
+        if not match:
+          return OTHER_COMPONENT
+        name = match.lastgroup
+        if name == 'app':
+          return APP_COMPONENT
+        component = match.group(name)
+        # Components from the component manager are named <namespace>__<name>.
+        if name == 'managed' or (name != 'top' and '__' in component):
+          return 'managed_components/' + component
+        return component
+    def Classify(self, outputs):
+        """Returns the (component, phase) of a build step, based on its first
+        output."""
+        output = outputs[0].replace('\\', '/')
+        directory, _, name = output.rpartition('/')
+        component = self._component_by_dir.get(directory)
+        if component is None:
+          component = self._component_by_dir[directory] = self._Component(
+              directory)
+        ext = name.rpartition('.')[2]
+        phase = self._phase_by_ext.get(ext)
+        if phase is None:
+          phase = self._phase_by_ext[ext] = PHASES.get(ext, 'other')
+        return component, phase
+def _WeightedDurationsPython(starts, ends):
+    """Returns the weighted duration of every row of the |starts| and |ends|
+    columns as a list, using a sweep over the sorted start/stop events."""
     # Create a list that is in order by time stamp and has entries for the
     # beginning and ending of each build step (one time stamp may have multiple
     # entries due to multiple steps starting/stopping at exactly the same time).
-    # Iterate through this list, keeping track of which tasks are running at all
-    # times. At each time step calculate a running total for weighted time so
-    # that when each task ends its own weighted time can easily be calculated.
-    task_start_stop_times = []
-    earliest = -1
-    latest = 0
-    total_cpu_time = 0
-    for target in entries:
-      if earliest < 0 or target.start < earliest:
-        earliest = target.start
-      if target.end > latest:
-        latest = target.end
-      total_cpu_time += target.Duration()
-      task_start_stop_times.append((target.start, 'start', target))
-      task_start_stop_times.append((target.end, 'stop', target))
-    length = latest - earliest
-    weighted_total = 0.0
-    # Sort by the time/type records and ignore |target|
-    task_start_stop_times.sort(key=lambda times: times[:2])
-    # Now we have all task start/stop times sorted by when they happen. If a
-    # task starts and stops on the same time stamp then the start will come
-    # first because of the alphabet, which is important for making this work
-    # correctly.
-    # Track the tasks which are currently running.
-    running_tasks = {}
+    # Iterate through this list, keeping track of how many tasks are running at
+    # all times. At each time step calculate a running total for weighted time
+    # so that when each task ends its own weighted time can easily be
+    # calculated.
+    count = len(starts)
+    # Starts are 0 and stops are 1 so that if a task starts and stops on the
+    # same time stamp then the start will come first, which is important for
+    # making this work correctly. Ties are broken by row, like a stable sort.
+    task_start_stop_times = [(timestamp, 0, i)
+                             for i, timestamp in enumerate(starts)]
+    task_start_stop_times.extend((timestamp, 1, i)
+                                 for i, timestamp in enumerate(ends))
+    task_start_stop_times.sort()
+    # The total weighted task time when each running task started.
+    start_weighted_times = [0.0] * count
+    weighted = [0.0] * count
+    num_running = 0
     # Record the time we have processed up to so we know how to calculate time
     # deltas.
-    last_time = task_start_stop_times[0][0]
+    last_time = task_start_stop_times[0][0] if count else 0.0
     # Track the accumulated weighted time so that it can efficiently be added
     # to individual tasks.
     last_weighted_time = 0.0
     # Scan all start/stop events.
-    for event in task_start_stop_times:
-      time, action_name, target = event
+    for timestamp, is_stop, i in task_start_stop_times:
       # Accumulate weighted time up to now.
-      num_running = len(running_tasks)
       if num_running > 0:
         # Update the total weighted time up to this moment.
-        last_weighted_time += (time - last_time) / float(num_running)
-      if action_name == 'start':
-        # Record the total weighted task time when this task starts.
-        running_tasks[target] = last_weighted_time
-      if action_name == 'stop':
+        last_weighted_time += (timestamp - last_time) / float(num_running)
+      if is_stop:
         # Record the change in the total weighted task time while this task ran.
-        weighted_duration = last_weighted_time - running_tasks[target]
-        target.SetWeightedDuration(weighted_duration)
-        weighted_total += weighted_duration
-        del running_tasks[target]
-      last_time = time
-    assert(len(running_tasks) == 0)
+        weighted[i] = last_weighted_time - start_weighted_times[i]
+        num_running -= 1
+      else:
+        # Record the total weighted task time when this task starts.
+        start_weighted_times[i] = last_weighted_time
+        num_running += 1
+      last_time = timestamp
+    assert(num_running == 0)
+    return weighted
+def _WeightedDurationsNumpy(starts, ends):
+    """Vectorized equivalent of _WeightedDurationsPython, returning a NumPy
+    array. The same sweep is expressed as a sorted event array, the cumulative
+    sum of elapsed time divided by the concurrency between events, and a
+    difference of that sum between each task's stop and start events."""
+    count = len(starts)
+    times = np.concatenate((np.asarray(starts, dtype=np.float64),
+                            np.asarray(ends, dtype=np.float64)))
+    is_stop = np.zeros(2 * count, dtype=np.int8)
+    is_stop[count:] = 1
+    # Sort by time, then starts before stops, then by row (lexsort is stable).
+    order = np.lexsort((is_stop, times))
+    # Number of running tasks right after each event.
+    running = np.cumsum(1 - 2 * is_stop[order].astype(np.int64))
+    deltas = np.diff(times[order])
+    concurrency = running[:-1]
+    increments = np.zeros_like(deltas)
+    np.divide(deltas, concurrency, out=increments, where=concurrency > 0)
+    # Accumulated weighted time at each event.
+    weighted_time = np.zeros(2 * count, dtype=np.float64)
+    np.cumsum(increments, out=weighted_time[1:])
+    # Position of each event in the sorted order.
+    position = np.empty(2 * count, dtype=np.intp)
+    position[order] = np.arange(2 * count)
+    return weighted_time[position[count:]] - weighted_time[position[:count]]
+def ResolveEngine(engine):
+    """Returns the engine actually used for |engine|, falling back to the
+    pure-Python one when NumPy is not installed."""
+    if engine in ('auto', 'numpy'):
+      return 'numpy' if np is not None else 'python'
+    return engine
+def ComputeWeightedDurations(table, engine='auto'):
+    """Returns the weighted durations of the rows of |table|, as a list or a
+    NumPy array depending on the engine."""
+    if ResolveEngine(engine) == 'numpy':
+      return _WeightedDurationsNumpy(table.start, table.end)
+    return _WeightedDurationsPython(table.start, table.end)
+def SummarizeEntries(entries, extra_step_types, engine='auto'):
+    """Print a summary of the passed in list of Target objects."""
+    table = TargetTable.FromTargets(entries)
+    weighted = SummarizeTable(table, extra_step_types, engine)
+    for target, weighted_duration in zip(entries, weighted):
+      target.SetWeightedDuration(weighted_duration)
+def SummarizeTable(table, extra_step_types, engine='auto'):
+    """Print a summary of the passed in TargetTable. Returns the weighted
+    durations of its rows."""
+    summary, weighted = ComputeSummary(table, extra_step_types, engine)
+    PrintSummary(summary)
+    return weighted
+def ComputeSummary(table, extra_step_types, engine='auto', by_component=False):
+    """Computes the statistics of the passed in TargetTable. Returns a
+    JSON-serializable dictionary and the weighted durations of the rows.
+    |by_component| adds the time spent in each ESP-IDF component."""
+    weighted = ComputeWeightedDurations(table, engine)
+    if ResolveEngine(engine) == 'numpy':
+      starts = np.frombuffer(table.start, dtype=np.float64)
+      ends = np.frombuffer(table.end, dtype=np.float64)
+      durations = ends - starts
+      earliest, latest = float(starts.min()), float(ends.max())
+      total_cpu_time = float(durations.sum())
+      weighted_total = float(weighted.sum())
+      excess = weighted - durations
+      worst = int(excess.argmax())
+      # Slowest build steps (by weighted time), in the same order as a stable
+      # sort of all of them.
+      longest = np.argsort(weighted, kind='stable')[-long_count:].tolist()
+      durations = durations.tolist()
+      weighted = weighted.tolist()
+    else:
+      durations = [end - start for start, end in zip(table.start, table.end)]
+      earliest, latest = min(table.start), max(table.end)
+      total_cpu_time = sum(durations)
+      weighted_total = sum(weighted)
+      worst = max(range(len(table)),
+                  key=lambda i: weighted[i] - durations[i])
+      longest = sorted(range(len(table)),
+                       key=weighted.__getitem__)[-long_count:]
+    length = latest - earliest
+    # weighted_duration should always be the same or shorter than duration.
+    if weighted[worst] > durations[worst] + WEIGHTED_EPSILON:
+      print('%s > %s?' % (weighted[worst], durations[worst]))
+    assert(weighted[worst] <= durations[worst] + WEIGHTED_EPSILON)
+    warnings = []
     # Warn if the sum of weighted times is off by more than half a second.
     if abs(length - weighted_total) > 500:
-      print('Warning: Possible corrupt ninja log, results may be '
-            'untrustworthy. Length = %.3f, weighted total = %.3f' % (
-            length, weighted_total))
-    # Print the slowest build steps (by weighted time).
-    print('    Longest build steps:')
-    entries.sort(key=lambda x: x.WeightedDuration())
-    for target in entries[-long_count:]:
-      print('      %8.1f weighted s to build %s (%.1f s elapsed time)' % (
-            target.WeightedDuration(),
-            target.DescribeTargets(), target.Duration()))
+      warnings.append('Possible corrupt ninja log, results may be '
+                      'untrustworthy. Length = %.3f, weighted total = %.3f' % (
+                      length, weighted_total))
     # Sum up the time by file extension/type of the output file
     count_by_ext = {}
     time_by_ext = {}
     weighted_time_by_ext = {}
     # Scan through all of the targets to build up per-extension statistics.
-    for target in entries:
-      extension = GetExtension(target, extra_step_types)
-      time_by_ext[extension] = time_by_ext.get(extension, 0) + target.Duration()
+    for i, outputs in enumerate(table.targets):
+      extension = GetOutputsExtension(outputs, extra_step_types)
+      time_by_ext[extension] = time_by_ext.get(extension, 0) + durations[i]
       weighted_time_by_ext[extension] = weighted_time_by_ext.get(extension,
-              0) + target.WeightedDuration()
+              0) + weighted[i]
       count_by_ext[extension] = count_by_ext.get(extension, 0) + 1
-    print('    Time by build-step type:')
     # Copy to a list with extension name and total time swapped, to (time, ext)
     weighted_time_by_ext_sorted = sorted((y, x) for (x, y) in
                                           weighted_time_by_ext.items())
+    summary = {
+        'warnings': warnings,
+        # Slowest first.
+        'longest_steps': [{
+            'outputs': table.targets[i],
+            'start': table.start[i] - earliest,
+            'end': table.end[i] - earliest,
+            'duration': durations[i],
+            'weighted_duration': weighted[i],
+        } for i in reversed(longest)],
+        'step_types': [{
+            'type': extension,
+            'count': count_by_ext[extension],
+            'duration': time_by_ext[extension],
+            'weighted_duration': time,
+        } for time, extension in reversed(weighted_time_by_ext_sorted)],
+        'weighted_duration': length,
+        'duration': total_cpu_time,
+        'parallelism': total_cpu_time * 1.0 / length,
+        'steps': len(table),
+        'steps_per_second': len(table) / (length),
+    }
+    if by_component:
+      summary['components'] = _ComponentStatistics(table, durations, weighted)
+    return summary, weighted
+def _ComponentStatistics(table, durations, weighted):
+    """Returns the time spent in each ESP-IDF component, split by phase,
+    slowest (by weighted time) first."""
+    classifier = ComponentClassifier()
+    components = {}
+    for i, outputs in enumerate(table.targets):
+      component, phase = classifier.Classify(outputs)
+      stats = components.get(component)
+      if stats is None:
+        stats = components[component] = {
+            'component': component,
+            'count': 0,
+            'duration': 0.0,
+            'weighted_duration': 0.0,
+            'phases': {},
+        }
+      phase_stats = stats['phases'].get(phase)
+      if phase_stats is None:
+        phase_stats = stats['phases'][phase] = {
+            'count': 0,
+            'duration': 0.0,
+            'weighted_duration': 0.0,
+        }
+      for totals in (stats, phase_stats):
+        totals['count'] += 1
+        totals['duration'] += durations[i]
+        totals['weighted_duration'] += weighted[i]
+    return sorted(components.values(),
+                  key=lambda stats: stats['weighted_duration'], reverse=True)
+def PrintSummary(summary):
+    """Prints a summary computed by ComputeSummary in human-readable form."""
+    for warning in summary['warnings']:
+      print('Warning: ' + warning)
+    # Print the slowest build steps (by weighted time).
+    print('    Longest build steps:')
+    for step in reversed(summary['longest_steps']):
+      print('      %8.1f weighted s to build %s (%.1f s elapsed time)' % (
+            step['weighted_duration'], DescribeOutputs(step['outputs']),
+            step['duration']))
+    print('    Time by build-step type:')
     # Print the slowest build target types (by weighted time):
-    for time, extension in weighted_time_by_ext_sorted[-long_ext_count:]:
+    for step_type in reversed(summary['step_types'][:long_ext_count]):
         print('      %8.1f s weighted time to generate %d %s files '
-               '(%1.1f s elapsed time sum)' % (time, count_by_ext[extension],
-                                        extension, time_by_ext[extension]))
+               '(%1.1f s elapsed time sum)' % (step_type['weighted_duration'],
+                                               step_type['count'],
+                                               step_type['type'],
+                                               step_type['duration']))
     print('    %.1f s weighted time (%.1f s elapsed time sum, %1.1fx '
-          'parallelism)' % (length, total_cpu_time,
-          total_cpu_time * 1.0 / length))
+          'parallelism)' % (summary['weighted_duration'], summary['duration'],
+          summary['parallelism']))
     print('    %d build steps completed, average of %1.2f/s' % (
-          len(entries), len(entries) / (length)))
+          summary['steps'], summary['steps_per_second']))
+    if 'components' in summary:
+      PrintComponents(summary['components'])
+    if 'critical_path' in summary:
+      PrintCriticalPath(summary['critical_path'], summary['weighted_duration'])
+    if 'simulation' in summary:
+      PrintSimulation(summary['simulation'])
+    if 'history' in summary:
+      PrintHistory(summary['history'])
+def PrintComponents(components):
+    """Prints the per-component statistics computed by ComputeSummary."""
+    print('    Time by ESP-IDF component:')
+    for stats in reversed(components[:long_component_count]):
+      phases = ', '.join('%s %.1f s' % (phase,
+                                        stats['phases'][phase][
+                                            'weighted_duration'])
+                         for phase in ('compile', 'archive', 'link', 'other')
+                         if phase in stats['phases'])
+      print('      %8.1f s weighted time in %d steps of %s (%.1f s elapsed '
+            'time sum; %s)' % (stats['weighted_duration'], stats['count'],
+                               stats['component'], stats['duration'], phases))
+def _UnescapeNinjaPath(path):
+    """Reverts the placeholders substituted by _ParseBuildLine."""
+    return path.replace('\x00', '$').replace('\x01', ' ').replace('\x02', ':')
+def _ParseBuildLine(line):
+    """Returns the (outputs, inputs) of a 'build' statement of a ninja
+    manifest. Implicit and order-only inputs are included in |inputs| as they
+    constrain the schedule as well; validations are not."""
+    escaped = '$' in line
+    if escaped:
+      line = line.replace('$$', '\x00').replace('$ ', '\x01')
+      line = line.replace('$:', '\x02')
+    outputs, _, inputs = line[len('build '):].partition(':')
+    outputs = [output for output in outputs.split() if output != '|']
+    inputs = inputs.split()[1:] # The first word is the rule.
+    if '|@' in inputs:
+      inputs = inputs[:inputs.index('|@')]
+    inputs = [path for path in inputs if path not in ('|', '||')]
+    if escaped:
+      outputs = [_UnescapeNinjaPath(path) for path in outputs]
+      inputs = [_UnescapeNinjaPath(path) for path in inputs]
+    return outputs, inputs
+def _ReadNinjaManifest(manifest_file, build_dir, inputs, seen):
+    """Adds the dependencies of the build statements of |manifest_file|, and
+    of the files it includes, to |inputs|. Paths in include and subninja
+    statements are relative to |build_dir|."""
+    if manifest_file in seen:
+      return
+    seen.add(manifest_file)
+    with open(manifest_file, 'r') as manifest:
+      pending = ''
+      for line in manifest:
+        line = line.rstrip('\r\n')
+        # A line ending with an odd number of '$' continues on the next one.
+        if (len(line) - len(line.rstrip('$'))) % 2:
+          pending += line[:-1]
+          continue
+        if pending:
+          line = pending + line.lstrip()
+          pending = ''
+        if line.startswith('build '):
+          outputs, step_inputs = _ParseBuildLine(line)
+          for output in outputs:
+            inputs.setdefault(output, []).extend(step_inputs)
+        elif line.startswith('include ') or line.startswith('subninja '):
+          path = _UnescapeNinjaPath(line.split(None, 1)[1].strip())
+          path = os.path.join(build_dir, path)
+          if os.path.isfile(path):
+            _ReadNinjaManifest(path, build_dir, inputs, seen)
+def _ReadNinjaDepsDump(deps_file, inputs):
+    """Adds the dependencies listed by 'ninja -t deps' to |inputs|."""
+    with open(deps_file, 'r') as deps:
+      target = None
+      for line in deps:
+        if not line.strip():
+          continue
+        if line[0].isspace():
+          if target is not None:
+            inputs.setdefault(target, []).append(line.strip())
+        elif ': #deps' in line:
+          target = line.partition(': #deps')[0]
+        else:
+          target = None
+def _ReadNinjaGraph(graph_file, inputs):
+    """Adds the dependencies of the graphviz output of 'ninja -t graph' to
+    |inputs|. Files are labelled nodes, build edges with several inputs or
+    outputs are ellipse-shaped nodes, and single-input edges are arrows."""
+    labels = {}
+    edge_nodes = set()
+    edge_inputs = {}
+    arrows = []
+    with open(graph_file, 'r') as graph:
+      for line in graph:
+        line = line.strip()
+        if not line.startswith('"'):
+          continue
+        if '->' in line.split('[', 1)[0]:
+          source, _, rest = line.partition('->')
+          arrows.append((source.strip().strip('"'),
+                         rest.split('[', 1)[0].strip().strip('"')))
+          continue
+        node, _, attributes = line.partition(' [')
+        label = attributes.partition('label="')[2].rpartition('"')[0]
+        if 'shape=ellipse' in attributes:
+          edge_nodes.add(node.strip('"'))
+        else:
+          labels[node.strip('"')] = label.replace('\\"', '"')
+    for source, dest in arrows:
+      if dest in edge_nodes:
+        edge_inputs.setdefault(dest, []).append(labels.get(source, source))
+    for source, dest in arrows:
+      if source in edge_nodes:
+        inputs.setdefault(labels.get(dest, dest), []).extend(
+            edge_inputs.get(source, []))
+      elif dest not in edge_nodes:
+        inputs.setdefault(labels.get(dest, dest), []).append(
+            labels.get(source, source))
+def ReadDependencies(deps_file):
+    """Returns a dictionary mapping each output path to the paths it depends
+    on. |deps_file| may be a build.ninja manifest or the saved output of
+    'ninja -t deps' or 'ninja -t graph'."""
+    inputs = {}
+    with open(deps_file, 'r') as deps:
+      first_line = ''
+      for line in deps:
+        if line.strip() and not line.startswith('#'):
+          first_line = line
+          break
+    if first_line.startswith('digraph'):
+      _ReadNinjaGraph(deps_file, inputs)
+    elif ': #deps ' in first_line:
+      _ReadNinjaDepsDump(deps_file, inputs)
+    else:
+      _ReadNinjaManifest(deps_file, os.path.dirname(deps_file), inputs, set())
+    return inputs
+def _LoggedPredecessors(row, table, inputs, producer):
+    """Returns the rows of the logged steps that |row| depends on, looking
+    through steps that did not run in this build such as phony targets."""
+    predecessors = set()
+    visited = set()
+    pending = list(table.targets[row])
+    while pending:
+      path = pending.pop()
+      if path in visited:
+        continue
+      visited.add(path)
+      for input_path in inputs.get(path, ()):
+        input_row = producer.get(input_path)
+        if input_row is not None and input_row != row:
+          predecessors.add(input_row)
+        elif input_row is None:
+          pending.append(input_path)
+    return predecessors
+def FindCriticalPath(table, inputs):
+    """Returns the rows of the chain of steps that bounded the wall-clock time
+    of the build, in chronological order. Starting from the step that
+    finished last, it repeatedly moves to the dependency that finished last
+    before the current step started, which is the one it was waiting for."""
+    if not len(table):
+      return []
+    producer = {}
+    for row, outputs in enumerate(table.targets):
+      for output in outputs:
+        producer[output] = row
+    row = max(range(len(table)), key=table.end.__getitem__)
+    path = [row]
+    on_path = {row}
+    while True:
+      start = table.start[row]
+      candidates = [p for p in _LoggedPredecessors(row, table, inputs, producer)
+                    if table.end[p] <= start and p not in on_path]
+      if not candidates:
+        break
+      row = max(candidates, key=table.end.__getitem__)
+      path.append(row)
+      on_path.add(row)
+    path.reverse()
+    return path
+def DescribeCriticalPath(table, rows):
+    """Returns a JSON-serializable description of the critical path |rows|,
+    with times relative to the start of the build."""
+    earliest = min(table.start)
+    steps = []
+    previous_end = earliest
+    for row in rows:
+      steps.append({
+          'outputs': table.targets[row],
+          'start': table.start[row] - earliest,
+          'end': table.end[row] - earliest,
+          'duration': table.end[row] - table.start[row],
+          # Time between the end of the previous step on the path and the
+          # start of this one, e.g. waiting for a free job slot.
+          'wait': table.start[row] - previous_end,
+      })
+      previous_end = table.end[row]
+    return steps
+def PrintCriticalPath(steps, length):
+    """Prints a critical path computed by DescribeCriticalPath."""
+    running = sum(step['duration'] for step in steps)
+    print('    Critical path (%d steps, %.1f s running and %.1f s waiting of '
+          '%.1f s):' % (len(steps), running, length - running, length))
+    for step in steps:
+      print('      %8.1f s at %8.1f s to build %s (%.1f s wait)' % (
+            step['duration'], step['start'], DescribeOutputs(step['outputs']),
+            step['wait']))
+def AssignLanes(table):
+    """Packs the rows of |table| into simulated worker lanes, so that steps
+    in the same lane never overlap. Returns the lane of every row."""
+    lanes = [0] * len(table)
+    free_lanes = []
+    busy_lanes = []
+    lane_count = 0
+    for row in sorted(range(len(table)),
+                      key=lambda i: (table.start[i], table.end[i])):
+      start = table.start[row]
+      while busy_lanes and busy_lanes[0][0] <= start:
+        heapq.heappush(free_lanes, heapq.heappop(busy_lanes)[1])
+      if free_lanes:
+        lane = heapq.heappop(free_lanes)
+      else:
+        lane = lane_count
+        lane_count += 1
+      heapq.heappush(busy_lanes, (table.end[row], lane))
+      lanes[row] = lane
+    return lanes
+def WriteTrace(trace_file, table, weighted, extra_step_types,
+               critical_path=()):
+    """Writes the steps of |table| as Chrome trace events (complete 'X'
+    events, one thread per simulated worker lane) which can be loaded in
+    Perfetto or chrome://tracing."""
+    earliest = min(table.start) if len(table) else 0.0
+    lanes = AssignLanes(table)
+    critical = set(critical_path)
+    events = [{
+        'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': lane,
+        'args': {'name': 'worker %d' % lane},
+    } for lane in range(max(lanes) + 1 if lanes else 0)]
+    for row, outputs in enumerate(table.targets):
+      args = {
+          'outputs': outputs,
+          'weighted_duration': weighted[row],
+      }
+      if row in critical:
+        args['critical_path'] = True
+      events.append({
+          'name': DescribeOutputs(outputs),
+          'cat': GetOutputsExtension(outputs, extra_step_types),
+          'ph': 'X',
+          'pid': 0,
+          'tid': lanes[row],
+          # Trace event times are in microseconds.
+          'ts': int(round((table.start[row] - earliest) * 1000000)),
+          'dur': int(round((table.end[row] - table.start[row]) * 1000000)),
+          'args': args,
+      })
+    with open(trace_file, 'w') as trace:
+      json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace)
+def StepDependencies(table, inputs):
+    """Returns, for every row of |table|, the list of rows of the logged steps
+    it depends on, looking through steps that did not run in this build such
+    as phony targets. Unlike _LoggedPredecessors this resolves every row, so
+    the paths not produced by a logged step are memoized."""
+    producer = {}
+    for row, outputs in enumerate(table.targets):
+      for output in outputs:
+        producer[output] = row
+    # Maps a path not produced by a logged step to the rows it depends on.
+    resolved = {}
+    # Paths being expanded. Like ninja, which accepts a phony target naming
+    # itself as an input, cycles are tolerated: a back edge to one of these
+    # paths resolves to nothing.
+    in_progress = set()
+    def Resolve(path):
+      stack = [(path, False)]
+      while stack:
+        node, expanded = stack.pop()
+        if node in resolved:
+          continue
+        if expanded:
+          rows = set()
+          for input_path in inputs.get(node, ()):
+            input_row = producer.get(input_path)
+            if input_row is not None:
+              rows.add(input_row)
+            else:
+              rows.update(resolved.get(input_path, ()))
+          resolved[node] = rows
+          in_progress.discard(node)
+          continue
+        if node in in_progress:
+          continue
+        in_progress.add(node)
+        stack.append((node, True))
+        for input_path in inputs.get(node, ()):
+          if (input_path not in producer and input_path not in resolved and
+              input_path not in in_progress):
+            stack.append((input_path, False))
+      return resolved[path]
+    predecessors = []
+    for row, outputs in enumerate(table.targets):
+      rows = set()
+      for output in outputs:
+        for input_path in inputs.get(output, ()):
+          input_row = producer.get(input_path)
+          if input_row is not None:
+            rows.add(input_row)
+          else:
+            rows.update(Resolve(input_path))
+      rows.discard(row)
+      predecessors.append(list(rows))
+    return predecessors
+def _ScheduleWallTime(durations, priorities, successors, predecessor_counts,
+                      jobs):
+    """Replays |durations| through a list scheduler with |jobs| slots. Ready
+    steps are started lowest |priorities| first, and a step becomes ready
+    when all its predecessors have finished. Returns the wall time."""
+    remaining = list(predecessor_counts)
+    ready = [(priorities[row], row) for row in range(len(durations))
+             if not remaining[row]]
+    heapq.heapify(ready)
+    # Min-heap of (finish time, row) of the running steps.
+    running = []
+    now = 0.0
+    scheduled = 0
+    while scheduled < len(durations):
+      while ready and len(running) < jobs:
+        _, row = heapq.heappop(ready)
+        heapq.heappush(running, (now + durations[row], row))
+        scheduled += 1
+      if not running:
+        # Only possible with a dependency cycle in the input, in which case
+        # the steps involved are simply started in priority order.
+        ready = [(priorities[row], row) for row in range(len(durations))
+                 if remaining[row] > 0]
+        heapq.heapify(ready)
+        for _, row in ready:
+          remaining[row] = 0
+        continue
+      now, row = heapq.heappop(running)
+      for successor in successors[row]:
+        remaining[successor] -= 1
+        if remaining[successor] == 0:
+          heapq.heappush(ready, (priorities[successor], successor))
+    while running:
+      now, _ = heapq.heappop(running)
+    return now
+def _CriticalPathBound(durations, successors, predecessor_counts):
+    """Returns the length of the longest chain of dependent steps, which no
+    number of jobs can beat."""
+    remaining = list(predecessor_counts)
+    earliest_finish = list(durations)
+    pending = [row for row in range(len(durations)) if not remaining[row]]
+    while pending:
+      row = pending.pop()
+      for successor in successors[row]:
+        earliest_finish[successor] = max(
+            earliest_finish[successor],
+            earliest_finish[row] + durations[successor])
+        remaining[successor] -= 1
+        if remaining[successor] == 0:
+          pending.append(successor)
+    return max(earliest_finish) if earliest_finish else 0.0
+def SimulateJobs(table, job_counts, predecessors=None):
+    """Predicts the wall time of the build of |table| for each of the
+    |job_counts| by replaying the recorded step durations through a list
+    scheduler. |predecessors| (from StepDependencies) constrains the order;
+    without it steps are only started in their recorded start order, which
+    gives an optimistic bound. Returns a JSON-serializable dictionary."""
+    durations = [end - start for start, end in zip(table.start, table.end)]
+    # Ninja starts ready steps roughly in manifest order, which the recorded
+    # start times reflect.
+    priorities = list(table.start)
+    successors = [[] for _ in durations]
+    predecessor_counts = [0] * len(durations)
+    if predecessors is not None:
+      for row, rows in enumerate(predecessors):
+        predecessor_counts[row] = len(rows)
+        for predecessor in rows:
+          successors[predecessor].append(row)
+    total = sum(durations)
+    results = []
+    for jobs in sorted(set(job_counts)):
+      wall = _ScheduleWallTime(durations, priorities, successors,
+                               predecessor_counts, jobs)
+      results.append({
+          'jobs': jobs,
+          'wall_time': wall,
+          'speedup': 0.0,
+          # Fraction of the job slots busy during the build.
+          'utilization': total / (jobs * wall) if wall else 0.0,
+      })
+    for result in results:
+      result['speedup'] = (results[0]['wall_time'] / result['wall_time']
+                           if result['wall_time'] else 0.0)
+    # The smallest job count beyond which adding jobs no longer pays off, if
+    # any of the simulated ones.
+    saturation = None
+    for result, following in zip(results, results[1:]):
+      if (following['wall_time'] >
+          result['wall_time'] * (1.0 - SIMULATION_MIN_GAIN)):
+        saturation = result['jobs']
+        break
+    return {
+        'dependencies': predecessors is not None,
+        'critical_path_bound': (_CriticalPathBound(durations, successors,
+                                                   predecessor_counts)
+                                if predecessors is not None else
+                                max(durations) if durations else 0.0),
+        'recorded_wall_time': (max(table.end) - min(table.start)
+                               if len(table) else 0.0),
+        'jobs': results,
+        'saturation_jobs': saturation,
+    }
+def PrintSimulation(simulation):
+    """Prints the predictions computed by SimulateJobs."""
+    print('    Simulated build times (%s, recorded %.1f s):' % (
+          'with dependencies' if simulation['dependencies'] else
+          'no dependencies, start order only',
+          simulation['recorded_wall_time']))
+    print('          -j     wall s  speedup  utilization')
+    for result in simulation['jobs']:
+      print('      %6d %10.1f %7.2fx %11.1f%%' % (
+            result['jobs'], result['wall_time'], result['speedup'],
+            result['utilization'] * 100.0))
+    print('    Longest dependency chain: %.1f s' %
+          simulation['critical_path_bound'])
+    if simulation['saturation_jobs'] is not None:
+      print('    More than %d job(s) gains less than %d%% wall time.' % (
+            simulation['saturation_jobs'], SIMULATION_MIN_GAIN * 100))
+    elif simulation['jobs']:
+      print('    Wall time still improves by %d%% or more at %d jobs.' % (
+            SIMULATION_MIN_GAIN * 100, simulation['jobs'][-1]['jobs']))
+class BuildHistory:
+    """Persistent per-build statistics in a SQLite database: every step's
+    elapsed and weighted durations, indexed by cmdhash and build, and totals
+    by build-step type. The database also remembers how far the log was
+    read, so ingesting only parses the records appended since, plus the
+    last build when it is still growing."""
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS builds (
+            id INTEGER PRIMARY KEY,
+            -- Time of the last record of the build, in seconds since the
+            -- epoch, as far as it is known: it is the modification time of
+            -- the log when the build was ingested as the last one, and is
+            -- kept when a later ingestion closes it.
+            timestamp REAL NOT NULL,
+            steps INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            weighted_duration REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS builds_by_timestamp ON builds (timestamp);
+        CREATE TABLE IF NOT EXISTS steps (
+            build_id INTEGER NOT NULL REFERENCES builds (id),
+            cmdhash TEXT NOT NULL,
+            outputs TEXT NOT NULL,
+            type TEXT NOT NULL,
+            start REAL NOT NULL,
+            end REAL NOT NULL,
+            duration REAL NOT NULL,
+            weighted_duration REAL NOT NULL,
+            PRIMARY KEY (build_id, cmdhash));
+        CREATE INDEX IF NOT EXISTS steps_by_cmdhash
+            ON steps (cmdhash, build_id);
+        CREATE TABLE IF NOT EXISTS step_types (
+            build_id INTEGER NOT NULL REFERENCES builds (id),
+            type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            duration REAL NOT NULL,
+            weighted_duration REAL NOT NULL,
+            PRIMARY KEY (build_id, type));
+        CREATE TABLE IF NOT EXISTS state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL);
+        '''
+    def __init__(self, db_file):
+        import sqlite3
+        self.db = sqlite3.connect(db_file)
+        self.db.executescript(self.SCHEMA)
+    def Close(self):
+        self.db.close()
+    def _LoadState(self):
+        row = self.db.execute(
+            "SELECT value FROM state WHERE key = 'log'").fetchone()
+        return json.loads(row[0]) if row else None
+    def _SaveState(self, state):
+        self.db.execute("INSERT OR REPLACE INTO state VALUES ('log', ?)",
+                        (json.dumps(state),))
+    def _LoadBuildTable(self, build_id):
+        """Returns the steps of a stored build as a TargetTable."""
+        table = TargetTable()
+        for cmdhash, outputs, start, end in self.db.execute(
+            'SELECT cmdhash, outputs, start, end FROM steps WHERE build_id = ? '
+            'ORDER BY rowid', (build_id,)):
+          table.start.append(start)
+          table.end.append(end)
+          table.cmdhash.append(cmdhash)
+          table.targets.append(outputs.split('\n'))
+        return table
+    def _ContinuesBuild(self, build_id, lines, last_end_seen):
+        """Returns whether the first record of |lines| belongs to the stored
+        build |build_id|, with the build boundary detection of TableParser,
+        or None when |lines| has no record."""
+        for line in lines:
+          parts = line.strip().split('\t')
+          if len(parts) != 5:
+            continue
+          start, end, _, _, cmdhash = parts
+          start = int(start) / 1000.0
+          end = int(end) / 1000.0
+          if end < last_end_seen:
+            return False
+          row = self.db.execute(
+              'SELECT start, end FROM steps WHERE build_id = ? AND cmdhash = ?',
+              (build_id, cmdhash)).fetchone()
+          return row is None or row == (start, end)
+        return None
+    def _ContinuedTimestamp(self, build_id, table, last_end_seen):
+        """Returns the timestamp of stored build |build_id| once continued by
+        the records now in |table|: the stored timestamp was taken when its
+        last record, ending at |last_end_seen|, had been written, so it is
+        moved forward by the build time since."""
+        timestamp, = self.db.execute(
+            'SELECT timestamp FROM builds WHERE id = ?', (build_id,)).fetchone()
+        return timestamp + max(0.0, max(table.end) - last_end_seen)
+    def _StoreBuild(self, build_id, table, timestamp, extra_step_types):
+        """Stores the build of |table|, replacing build |build_id| if it is
+        not None. Returns the id of the build."""
+        weighted = list(ComputeWeightedDurations(table))
+        durations = [end - start for start, end in zip(table.start, table.end)]
+        types = [GetOutputsExtension(outputs, extra_step_types)
+                 for outputs in table.targets]
+        build = (timestamp, len(table), sum(durations),
+                 max(table.end) - min(table.start))
+        if build_id is None:
+          build_id = self.db.execute(
+              'INSERT INTO builds (timestamp, steps, duration, '
+              'weighted_duration) VALUES (?, ?, ?, ?)', build).lastrowid
+        else:
+          self.db.execute(
+              'UPDATE builds SET timestamp = ?, steps = ?, duration = ?, '
+              'weighted_duration = ? WHERE id = ?', build + (build_id,))
+          self.db.execute('DELETE FROM steps WHERE build_id = ?', (build_id,))
+          self.db.execute('DELETE FROM step_types WHERE build_id = ?',
+                          (build_id,))
+        self.db.executemany(
+            'INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((build_id, cmdhash, '\n'.join(outputs), step_type, start, end,
+              duration, weighted_duration)
+             for cmdhash, outputs, step_type, start, end, duration,
+                 weighted_duration in zip(table.cmdhash, table.targets, types,
+                                          table.start, table.end, durations,
+                                          weighted)))
+        by_type = {}
+        for step_type, duration, weighted_duration in zip(types, durations,
+                                                          weighted):
+          totals = by_type.setdefault(step_type, [0, 0.0, 0.0])
+          totals[0] += 1
+          totals[1] += duration
+          totals[2] += weighted_duration
+        self.db.executemany(
+            'INSERT INTO step_types VALUES (?, ?, ?, ?, ?)',
+            ((build_id, step_type, count, duration, weighted_duration)
+             for step_type, (count, duration, weighted_duration)
+             in by_type.items()))
+        return build_id
+    def Ingest(self, log_file, extra_step_types=None):
+        """Stores the builds of |log_file| that were not ingested yet. Returns
+        the number of records read."""
+        with open(log_file, 'rb') as log:
+          stat = os.fstat(log.fileno())
+          header = log.readline().decode('utf-8', 'replace')
+          assert header == NINJA_LOG_HEADER, \
+                 'unrecognized ninja log version %r' % header
+          state = self._LoadState()
+          open_build_id = None
+          last_end_seen = 0.0
+          if state and _LogUnchanged(state, log, stat, header):
+            offset = state['offset']
+            open_build_id = state['open_build_id']
+            last_end_seen = state['last_end_seen']
+          elif state:
+            # The log was recompacted or recreated: its records are either
+            # already ingested or unrelated, so only follow new ones.
+            log.seek(0, os.SEEK_END)
+            offset = log.tell()
+          else:
+            offset = len(NINJA_LOG_HEADER)
+          log.seek(offset)
+          data = log.read()
+          complete = data.rfind(b'\n') + 1
+          lines = data[:complete].decode('utf-8', 'replace').splitlines()
+          offset += complete
+          # The build left open last time is only loaded, to be stored again,
+          # when the new records continue it. Otherwise it is complete as
+          # stored, which keeps ingesting proportional to the new records.
+          table = None
+          continued = False
+          if open_build_id is not None and lines:
+            continues = self._ContinuesBuild(open_build_id, lines,
+                                             last_end_seen)
+            if continues:
+              table = self._LoadBuildTable(open_build_id)
+              continued = True
+            elif continues is not None:
+              open_build_id = None
+          finished = []
+          parser = TableParser(False, table, last_end_seen, finished.append)
+          parser.ParseLines(lines)
+          with self.db:
+            for build in finished:
+              if continued:
+                # The build left open last time, now followed by a new one.
+                self._StoreBuild(open_build_id, build,
+                                 self._ContinuedTimestamp(open_build_id, build,
+                                                          last_end_seen),
+                                 extra_step_types)
+                continued = False
+              else:
+                self._StoreBuild(None, build, stat.st_mtime, extra_step_types)
+              open_build_id = None
+            if len(parser.table):
+              open_build_id = self._StoreBuild(open_build_id, parser.table,
+                                               stat.st_mtime, extra_step_types)
+            self._SaveState({
+                'header': header,
+                'inode': stat.st_ino,
+                'offset': offset,
+                'anchor': _LogAnchor(log, offset),
+                'last_end_seen': parser.last_end_seen,
+                'open_build_id': open_build_id,
+            })
+        return len(lines)
+    def BuildCount(self):
+        return self.db.execute('SELECT COUNT(*) FROM builds').fetchone()[0]
+    def WeightedTimeChange(self):
+        """Returns the total weighted time of the last two builds, or None if
+        there are not two builds yet."""
+        rows = self.db.execute(
+            'SELECT weighted_duration FROM builds ORDER BY id DESC '
+            'LIMIT 2').fetchall()
+        if len(rows) < 2:
+          return None
+        (last,), (previous,) = rows
+        return {
+            'previous': previous,
+            'last': last,
+            'change': last - previous,
+            'relative_change': ((last - previous) / previous
+                                if previous else 0.0),
+        }
+    def Regressions(self, threshold, window,
+                    min_seconds=HISTORY_MIN_REGRESSION):
+        """Returns the steps of the last build whose elapsed time exceeds the
+        median of their previous |window| runs by more than |threshold|
+        (a fraction) and |min_seconds|, slowest regression first."""
+        row = self.db.execute('SELECT MAX(id) FROM builds').fetchone()
+        last_build_id = row[0]
+        if last_build_id is None:
+          return []
+        history = {}
+        for cmdhash, duration in self.db.execute(
+            'SELECT cmdhash, duration FROM ('
+            '  SELECT cmdhash, duration, ROW_NUMBER() OVER ('
+            '      PARTITION BY cmdhash ORDER BY build_id DESC) AS run'
+            '  FROM steps'
+            '  WHERE build_id < ? AND cmdhash IN ('
+            '      SELECT cmdhash FROM steps WHERE build_id = ?))'
+            'WHERE run <= ?', (last_build_id, last_build_id, window)):
+          history.setdefault(cmdhash, []).append(duration)
+        regressions = []
+        for cmdhash, outputs, duration in self.db.execute(
+            'SELECT cmdhash, outputs, duration FROM steps WHERE build_id = ?',
+            (last_build_id,)):
+          durations = history.get(cmdhash)
+          if not durations:
+            continue
+          median = statistics.median(durations)
+          if (duration - median > min_seconds and
+              duration > median * (1.0 + threshold)):
+            regressions.append({
+                'outputs': outputs.split('\n'),
+                'duration': duration,
+                'median': median,
+                'runs': len(durations),
+                'relative_change': (duration - median) / median
+                                   if median else None,
+            })
+        regressions.sort(key=lambda entry: entry['duration'] - entry['median'],
+                         reverse=True)
+        return regressions
+def PrintHistory(history):
+    """Prints the history report built by main()."""
+    print('    Build history (%d builds):' % history['builds'])
+    change = history['weighted_time_change']
+    if change:
+      print('      Weighted time %.1f s -> %.1f s (%+.1f s, %+.1f%%) since the '
+            'previous build' % (change['previous'], change['last'],
+                                change['change'],
+                                change['relative_change'] * 100.0))
+    regressions = history['regressions']
+    print('      %d steps regressed by more than %d%% against the median of '
+          'their last %d runs' % (len(regressions),
+                                  history['threshold'] * 100,
+                                  history['window']))
+    for entry in regressions[:long_count]:
+      print('      %8.1f s (median %.1f s) to build %s' % (
+            entry['duration'], entry['median'],
+            DescribeOutputs(entry['outputs'])))
+class _InotifyWatcher:
+    """Waits for changes to a file with Linux inotify, through ctypes. The
+    directory is watched so that the file being created, replaced or
+    recompacted by ninja is noticed as well."""
+    # Flags from <sys/inotify.h>.
+    IN_MODIFY = 0x2
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0x800
+    IN_CLOEXEC = 0x80000
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+          raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        directory = os.path.dirname(os.path.abspath(path))
+        if libc.inotify_add_watch(
+            self._fd, directory.encode(),
+            self.IN_MODIFY | self.IN_MOVED_TO | self.IN_CREATE |
+            self.IN_DELETE) < 0:
+          os.close(self._fd)
+          raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+        self._name = os.path.basename(path).encode()
+    def Wait(self, timeout):
+        """Waits up to |timeout| seconds. Returns whether the file changed."""
+        import select
+        import struct
+        deadline = time.monotonic() + timeout
+        while True:
+          remaining = deadline - time.monotonic()
+          if remaining <= 0 or not select.select([self._fd], [], [],
+                                                 remaining)[0]:
+            return False
+          data = os.read(self._fd, 65536)
+          # struct inotify_event { int wd; uint32_t mask, cookie, len;
+          #                        char name[len]; }
+          offset = 0
+          while offset < len(data):
+            _, _, _, length = struct.unpack_from('iIII', data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+            if name == self._name:
+              return True
+            offset += 16 + length
+    def Close(self):
+        os.close(self._fd)
+class _PollWatcher:
+    """Waits for changes to a file by polling its size and inode."""
+    def __init__(self, path, poll_interval=FOLLOW_POLL_INTERVAL):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._last = self._Stat()
+    def _Stat(self):
+        try:
+          stat = os.stat(self._path)
+          return stat.st_ino, stat.st_size, stat.st_mtime
+        except OSError:
+          return None
+    def Wait(self, timeout):
+        """Waits up to |timeout| seconds. Returns whether the file changed."""
+        deadline = time.monotonic() + timeout
+        while True:
+          current = self._Stat()
+          if current != self._last:
+            self._last = current
+            return True
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            return False
+          time.sleep(min(self._poll_interval, remaining))
+    def Close(self):
+        pass
+def _CreateWatcher(path):
+    """Returns an inotify watcher where available, a polling one otherwise."""
+    if sys.platform.startswith('linux'):
+      try:
+        return _InotifyWatcher(path)
+      except (OSError, AttributeError):
+        pass
+    return _PollWatcher(path)
+class BuildFollower:
+    """Incremental weighted-time accounting for a build whose .ninja_log
+    records are still being appended. Busy time is accumulated in fixed-size
+    buckets of build time, so each record only updates the buckets it spans
+    and nothing is re-sorted. Weighted durations are computed from the
+    bucket concurrency, an approximation at FOLLOW_BUCKET_SIZE resolution
+    that is only evaluated for the longest steps seen so far."""
+    def __init__(self, show_all=False, window=FOLLOW_WINDOW):
+        self.window = window
+        self.parser = TableParser(show_all, on_build_done=self._BuildDone)
+        self._BuildDone(None)
+    def _BuildDone(self, _table):
+        """Forgets the statistics of the build that is over."""
+        # Busy (sum of step) time in each bucket of build time.
+        self.busy = []
+        self.steps = 0
+        self.total_duration = 0.0
+        self.earliest = None
+        # End times of the steps in the last |window| seconds.
+        self.recent_ends = collections.deque()
+        # Min-heap of (duration, row) of the longest steps.
+        self.longest = []
+        # First row of the parser table not accounted for yet.
+        self.next_row = 0
+    def _AddBusyTime(self, start, end):
+        busy = self.busy
+        first = int(start / FOLLOW_BUCKET_SIZE)
+        last = int(end / FOLLOW_BUCKET_SIZE)
+        if last >= len(busy):
+          busy.extend([0.0] * (last + 1 - len(busy)))
+        for bucket in range(first, last + 1):
+          bucket_start = bucket * FOLLOW_BUCKET_SIZE
+          busy[bucket] += (min(end, bucket_start + FOLLOW_BUCKET_SIZE) -
+                           max(start, bucket_start))
+    def ParseLines(self, lines):
+        """Feeds complete log lines (without the header) to the follower."""
+        self.parser.ParseLines(lines)
+        table = self.parser.table
+        # Rows are only appended, the records adding outputs to an existing
+        # row do not change the statistics.
+        for row in range(self.next_row, len(table)):
+          start = table.start[row]
+          end = table.end[row]
+          self.steps += 1
+          self.total_duration += end - start
+          if self.earliest is None or start < self.earliest:
+            self.earliest = start
+          self._AddBusyTime(start, end)
+          self.recent_ends.append(end)
+          entry = (end - start, row)
+          if len(self.longest) < FOLLOW_CANDIDATES:
+            heapq.heappush(self.longest, entry)
+          elif entry > self.longest[0]:
+            heapq.heapreplace(self.longest, entry)
+        self.next_row = len(table)
+    def WeightedDuration(self, row):
+        """Returns the approximate weighted duration of the step in |row|."""
+        weighted = 0.0
+        busy = self.busy
+        start = self.parser.table.start[row]
+        end = self.parser.table.end[row]
+        for bucket in range(int(start / FOLLOW_BUCKET_SIZE),
+                            int(end / FOLLOW_BUCKET_SIZE) + 1):
+          bucket_start = bucket * FOLLOW_BUCKET_SIZE
+          overlap = (min(end, bucket_start + FOLLOW_BUCKET_SIZE) -
+                     max(start, bucket_start))
+          if overlap > 0:
+            weighted += overlap / max(1.0, busy[bucket] / FOLLOW_BUCKET_SIZE)
+        return weighted
+    def Snapshot(self, idle):
+        """Returns a JSON-serializable snapshot of the build, |idle| seconds
+        after the last record was read."""
+        snapshot = {'steps': self.steps}
+        if not self.steps:
+          return snapshot
+        # Estimated current build time, assuming ninja is still running.
+        last_end_seen = self.parser.last_end_seen
+        now = last_end_seen + idle
+        window_start = max(self.earliest, now - self.window)
+        while self.recent_ends and self.recent_ends[0] < window_start:
+          self.recent_ends.popleft()
+        window = max(now - window_start, FOLLOW_BUCKET_SIZE)
+        first = int(window_start / FOLLOW_BUCKET_SIZE)
+        recent_busy = sum(self.busy[first:int(now / FOLLOW_BUCKET_SIZE) + 1])
+        length = max(last_end_seen - self.earliest, FOLLOW_BUCKET_SIZE)
+        slowest = sorted(((self.WeightedDuration(row), duration, row)
+                          for duration, row in self.longest),
+                         key=lambda entry: entry[0],
+                         reverse=True)[:FOLLOW_SLOWEST_COUNT]
+        snapshot.update({
+            'time': round(now - self.earliest, 1),
+            'idle': round(idle, 1),
+            'steps_per_second': round(len(self.recent_ends) / window, 2),
+            # Completed busy time over the window. Steps still running are not
+            # logged yet, so this lags behind while long steps run.
+            'parallelism': round(recent_busy / window, 2),
+            'average_parallelism': round(self.total_duration / length, 2),
+            'slowest': [{
+                'outputs': DescribeOutputs(self.parser.table.targets[row]),
+                'weighted_duration': round(weighted, 2),
+                'duration': round(duration, 2),
+            } for weighted, duration, row in slowest],
+        })
+        return snapshot
+def _ProcessAlive(pid):
+    """Returns whether process |pid| is still running."""
+    if os.name == 'nt':
+      # os.kill terminates the process on Windows, so ask kernel32 instead.
+      import ctypes
+      kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+      SYNCHRONIZE = 0x00100000
+      ERROR_ACCESS_DENIED = 5
+      WAIT_TIMEOUT = 0x102
+      handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+      if not handle:
+        # Processes of other users cannot be opened, but exist.
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+      try:
+        return kernel32.WaitForSingleObject(handle, 0) == WAIT_TIMEOUT
+      finally:
+        kernel32.CloseHandle(handle)
+    try:
+      os.kill(pid, 0)
+    except ProcessLookupError:
+      return False
+    except PermissionError:
+      pass
+    try:
+      # A zombie has exited, its parent just did not reap it yet.
+      with open('/proc/%d/stat' % pid) as stat:
+        return stat.read().rpartition(')')[2].split()[0] != 'Z'
+    except (OSError, IndexError):
+      return True
+def _FindNinjaProcess(build_dir):
+    """Returns the pid of a ninja process running in |build_dir|, or None.
+    Only implemented where /proc is available, main requires --pid
+    elsewhere."""
+    build_dir = os.path.realpath(build_dir)
+    try:
+      pids = [int(entry) for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+      return None
+    for pid in pids:
+      try:
+        with open('/proc/%d/comm' % pid) as comm:
+          if comm.read().strip() != 'ninja':
+            continue
+        if os.path.realpath(os.readlink('/proc/%d/cwd' % pid)) == build_dir:
+          return pid
+      except OSError:
+        # Gone, or owned by another user.
+        continue
+    return None
+def FollowLog(log_file, interval, pid=None, idle_timeout=None,
+              output=sys.stdout):
+    """Tails |log_file| while ninja appends to it and prints a compact JSON
+    snapshot of the build every |interval| seconds. Returns when process
+    |pid| exits, or after |idle_timeout| seconds without new records, with a
+    final snapshot marked as done. Without |pid|, a ninja process running in
+    the directory of |log_file| is looked for at every report.
+    The log is read from its start, the build boundary detection leaving
+    only the current build, so following can start after ninja did."""
+    follower = BuildFollower()
+    watcher = _CreateWatcher(log_file)
+    build_dir = os.path.dirname(os.path.abspath(log_file))
+    if pid is None:
+      pid = _FindNinjaProcess(build_dir)
+    log = None
+    inode = None
+    offset = 0
+    pending = b''
+    last_record = time.monotonic()
+    next_report = last_record + interval
+    def Report(done=False):
+      snapshot = follower.Snapshot(time.monotonic() - last_record)
+      if done:
+        snapshot['done'] = True
+      output.write(json.dumps(snapshot, separators=(',', ':')) + '\n')
+      output.flush()
+    try:
+      while True:
+        try:
+          stat = os.stat(log_file)
+        except OSError:
+          stat = None
+        if stat and (log is None or stat.st_ino != inode or
+                     stat.st_size < offset):
+          # The log was created, or replaced when ninja recompacted it.
+          if log:
+            log.close()
+            follower = BuildFollower()
+          log = open(log_file, 'rb')
+          inode = os.fstat(log.fileno()).st_ino
+          pending = b''
+          offset = 0
+        if log:
+          log.seek(offset)
+          data = log.read()
+          offset += len(data)
+          data = pending + data
+          complete = data.rfind(b'\n') + 1
+          pending = data[complete:]
+          if complete:
+            lines = data[:complete].decode('utf-8', 'replace').splitlines()
+            if lines and lines[0].startswith('# ninja log'):
+              lines = lines[1:]
+            follower.ParseLines(lines)
+            # The last record was written when the log was last modified,
+            # which matters for the records already there when following
+            # started.
+            last_record = time.monotonic()
+            if stat:
+              last_record -= max(0.0, time.time() - stat.st_mtime)
+        now = time.monotonic()
+        if now >= next_report:
+          Report()
+          next_report = now + interval
+          if pid is None:
+            pid = _FindNinjaProcess(build_dir)
+        if pid is not None and not _ProcessAlive(pid):
+          break
+        if idle_timeout and now - last_record > idle_timeout:
+          break
+        watcher.Wait(max(0.0, min(next_report - now, FOLLOW_POLL_INTERVAL
+                                  if pid is not None else interval)))
+    except KeyboardInterrupt:
+      pass
+    finally:
+      watcher.Close()
+      if log:
+        log.close()
+    Report(done=True)
+    return 0
 def main():
     log_file = '.ninja_log'
     parser = argparse.ArgumentParser()
@@ -278,6 +1742,56 @@ def main():
         help='semicolon separated fnmatch patterns for build-step grouping')
     parser.add_argument('--log-file',
                         help="specific ninja log file to analyze.")
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help='parse the whole log instead of resuming from '
+                        'the checkpoint stored next to it.')
+    parser.add_argument('--engine', choices=ENGINES, default='auto',
+                        help='engine computing weighted durations. "numpy" '
+                        'falls back to "python" when NumPy is not installed.')
+    parser.add_argument('--by-component', action='store_true',
+                        help='report the time spent in each ESP-IDF '
+                        'component, split into compile, archive and link.')
+    parser.add_argument('--format', choices=('text', 'json'), default='text',
+                        help='output format of the summary.')
+    parser.add_argument('--trace',
+                        help='write the build steps as Chrome trace events '
+                        '(Perfetto, chrome://tracing) to this file.')
+    parser.add_argument('--critical-path', action='store_true',
+                        help='report the chain of steps that bounded the '
+                        'wall-clock time of the build.')
+    parser.add_argument('--deps',
+                        help='dependencies for --critical-path: a build.ninja '
+                        'manifest or the saved output of "ninja -t deps" or '
+                        '"ninja -t graph". Defaults to the build.ninja next '
+                        'to the log file. "ninja -t deps" only lists header '
+                        'dependencies, so link steps are not connected.')
+    parser.add_argument('--simulate-jobs',
+                        help='comma separated -j values for which to predict '
+                        'the wall time, using the dependencies from --deps '
+                        'when available.')
+    parser.add_argument('--history', nargs='?', const='',
+                        help='record every build in this SQLite database '
+                        '(%s next to the log file by default) and report '
+                        'regressions against previous builds.' % HISTORY_FILE)
+    parser.add_argument('--regression-threshold', type=float, default=20.0,
+                        help='with --history, percentage by which a step must '
+                        'exceed its median duration to be reported.')
+    parser.add_argument('--history-window', type=int, default=5,
+                        help='with --history, number of previous runs of each '
+                        'step the median is computed over.')
+    parser.add_argument('--follow', action='store_true',
+                        help='tail the log while ninja is running and print '
+                        'a JSON line with the build progress periodically.')
+    parser.add_argument('--interval', type=float, default=2.0,
+                        help='seconds between --follow reports.')
+    parser.add_argument('--pid', type=int,
+                        help='with --follow, stop when this process (ninja) '
+                        'exits. Without it, a ninja running in the build '
+                        'directory is looked for in /proc, so it is required '
+                        'where /proc is not available (macOS, Windows).')
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help='with --follow, stop after this many seconds '
+                        'without new records. 0 disables it.')
     args, _extra_args = parser.parse_known_args()
     if args.build_directory:
         log_file = os.path.join(args.build_directory, log_file)
@@ -292,12 +1806,64 @@ def main():
       # Make room for the extra build types.
       global long_ext_count
       long_ext_count += len(args.step_types.split(';'))
+    if args.follow:
+      if args.pid is None and not os.path.isdir('/proc'):
+        # Otherwise the end of the build is only noticed after --idle-timeout.
+        parser.error('--follow requires --pid where /proc is not available')
+      return FollowLog(log_file, args.interval, args.pid, args.idle_timeout)
     try:
-      with open(log_file, 'r') as log:
-        entries = ReadTargets(log, False)
-        SummarizeEntries(entries, args.step_types)
+      if args.no_checkpoint:
+        with open(log_file, 'r') as log:
+          table = ReadTargetTable(log, False)
+      else:
+        table = ReadTargetTableIncremental(log_file, False)
     except IOError:
       print('Log file %r not found, no build summary created.' % log_file)
       return errno.ENOENT
+    summary, weighted = ComputeSummary(table, args.step_types, args.engine,
+                                       args.by_component)
+    critical_path = []
+    inputs = None
+    if args.critical_path or args.simulate_jobs:
+      deps_file = args.deps or os.path.join(os.path.dirname(log_file),
+                                            'build.ninja')
+      try:
+        inputs = ReadDependencies(deps_file)
+      except IOError:
+        summary['warnings'].append('Dependency file %r not found, build-step '
+                                   'dependencies are not available.' %
+                                   deps_file)
+    if args.critical_path and inputs is not None:
+      critical_path = FindCriticalPath(table, inputs)
+      summary['critical_path'] = DescribeCriticalPath(table, critical_path)
+    if args.simulate_jobs:
+      job_counts = [int(jobs) for jobs in args.simulate_jobs.split(',')]
+      if min(job_counts) < 1:
+        parser.error('--simulate-jobs values must be positive')
+      summary['simulation'] = SimulateJobs(
+          table, job_counts,
+          StepDependencies(table, inputs) if inputs is not None else None)
+    if args.history is not None:
+      history = BuildHistory(args.history or os.path.join(
+          os.path.dirname(log_file), HISTORY_FILE))
+      try:
+        history.Ingest(log_file, args.step_types)
+        summary['history'] = {
+            'builds': history.BuildCount(),
+            'threshold': args.regression_threshold / 100.0,
+            'window': args.history_window,
+            'weighted_time_change': history.WeightedTimeChange(),
+            'regressions': history.Regressions(
+                args.regression_threshold / 100.0, args.history_window),
+        }
+      finally:
+        history.Close()
+    if args.trace:
+      WriteTrace(args.trace, table, weighted, args.step_types, critical_path)
+    if args.format == 'json':
+      json.dump(summary, sys.stdout, indent=2)
+      print()
+    else:
+      PrintSummary(summary)
 if __name__ == '__main__':
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# Copyright 2026 Espressif Systems (Shanghai) CO LTD
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Rank headers by the compile time their modification would trigger.
+ninja records the headers discovered while compiling each object in its
+binary .ninja_deps file. This script reads that file through mmap, without
+running 'ninja -t deps', builds a reverse index from each header to the
+objects that include it and joins it with the step durations recorded in
+.ninja_log. Headers are then ranked by the seconds of compile triggered if
+they are touched:
+> python3 ninja-deps-impact.py -C build
+Typical output looks like this:
+    Headers by compile time triggered if touched:
+        2145.3 s to rebuild 1322 objects if config/sdkconfig.h changes
+         612.9 s to rebuild  401 objects if .../freertos/FreeRTOS.h changes
+Durations are elapsed (not weighted) times, summed over the dependent
+objects, from the most recent build of each of them found in the log."""
+import argparse
+import errno
+import json
+import mmap
+import os
+import struct
+import sys
+DEPS_SIGNATURE = b'# ninjadeps\n'
+# Same as in ninja-build-summary.py, which is not imported: it is much larger
+# than this script and imports NumPy.
+NINJA_LOG_HEADER = '# ninja log v5\n'
+# Supported .ninja_deps versions. Version 4 widened the mtime to 64 bits.
+DEPS_VERSIONS = (3, 4)
+# Extensions of the inputs ranked by default.
+HEADER_EXTENSIONS = ('.h', '.hh', '.hpp', '.hxx', '.inc', '.inl', '.ipp')
+# The number of headers to report:
+long_count = 20
+class NinjaDeps:
+    """Reads a .ninja_deps file through mmap. The file is a signature and a
+    version followed by records, each prefixed by a 32-bit size whose high bit
+    tells deps records from path records:
+      path: the path, NUL-padded to 4 bytes, then the one's complement of
+            its id (ids are assigned in order of appearance).
+      deps: the output id, its mtime, then the ids of its inputs.
+    A later deps record for an output replaces the earlier ones. The input
+    ids of each output are kept as 'i' memoryviews into the mapping, so
+    records are not copied; use it as a context manager to release them."""
+    def __init__(self, deps_file):
+        self._file = open(deps_file, 'rb')
+        # Maps path ids to paths.
+        self.paths = []
+        # Maps output ids to the memoryview of their input ids.
+        self.deps = {}
+        self._mmap = None
+        self._view = None
+        try:
+          if os.fstat(self._file.fileno()).st_size == 0:
+            raise ValueError('empty deps file %r' % deps_file)
+          self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+          self._view = memoryview(self._mmap)
+          self._Parse(deps_file)
+        except BaseException:
+          # __exit__ is not reached when __init__ fails.
+          self.Close()
+          raise
+    def _Parse(self, deps_file):
+        data = self._mmap
+        view = self._view
+        size = len(data)
+        header_size = len(DEPS_SIGNATURE) + 4
+        if size < header_size or data[:len(DEPS_SIGNATURE)] != DEPS_SIGNATURE:
+          raise ValueError('%r is not a ninja deps file' % deps_file)
+        version, = struct.unpack_from('<i', data, len(DEPS_SIGNATURE))
+        if version not in DEPS_VERSIONS:
+          raise ValueError('unsupported ninja deps version %d' % version)
+        # Output id and mtime, before the input ids.
+        deps_header_size = 4 + (8 if version >= 4 else 4)
+        paths = self.paths
+        deps = self.deps
+        offset = header_size
+        while offset + 4 <= size:
+          record_size, = struct.unpack_from('<I', data, offset)
+          offset += 4
+          is_deps = record_size & 0x80000000
+          record_size &= 0x7fffffff
+          if offset + record_size > size or record_size % 4:
+            # Truncated by an interrupted ninja. Like ninja, stop here.
+            break
+          if is_deps:
+            output_id, = struct.unpack_from('<i', data, offset)
+            # Like ninja, which fails to load such a record. Input ids are
+            # checked by ReverseIndex, which goes through them anyway.
+            if not 0 <= output_id < len(paths):
+              raise ValueError('deps record for unknown path id %d' %
+                               output_id)
+            deps[output_id] = view[offset + deps_header_size:
+                                   offset + record_size].cast('i')
+          else:
+            checksum, = struct.unpack_from('<I', data,
+                                           offset + record_size - 4)
+            if checksum != ~len(paths) & 0xffffffff:
+              break
+            path = bytes(view[offset:offset + record_size - 4]).rstrip(b'\0')
+            paths.append(path.decode('utf-8', 'replace'))
+          offset += record_size
+    def ReverseIndex(self):
+        """Returns, for every path id, the list of ids of the outputs that
+        depend on it. Raises ValueError on an unknown input id."""
+        count = len(self.paths)
+        dependents = [[] for _ in self.paths]
+        for output_id, input_ids in self.deps.items():
+          for input_id in input_ids:
+            if not 0 <= input_id < count:
+              raise ValueError('deps of %r use unknown path id %d' % (
+                               self.paths[output_id], input_id))
+            dependents[input_id].append(output_id)
+        return dependents
+    def Close(self):
+        for input_ids in self.deps.values():
+          input_ids.release()
+        self.deps = {}
+        if self._view is not None:
+          self._view.release()
+          self._view = None
+        if self._mmap is not None:
+          self._mmap.close()
+          self._mmap = None
+        self._file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.Close()
+def ReadDurations(log_file):
+    """Returns a dictionary mapping each output of |log_file| to the elapsed
+    time of the most recent build step that produced it."""
+    durations = {}
+    with open(log_file, 'r') as log:
+      header = log.readline()
+      assert header == NINJA_LOG_HEADER, \
+             'unrecognized ninja log version %r' % header
+      # Records are not grouped by command like in ninja-build-summary.py,
+      # which keeps the times of the first run of each command: every record
+      # overrides the earlier ones for its output, so the most recent run
+      # wins.
+      for line in log:
+        parts = line.strip().split('\t')
+        if len(parts) != 5:
+          # Corrupt line of an interrupted ninja.
+          continue
+        start, end, _, name, _ = parts
+        durations[name] = (int(end) - int(start)) / 1000.0
+    return durations
+def RankInputs(deps, durations, all_inputs=False):
+    """Returns a list of {'path', 'duration', 'objects', 'unknown'}
+    dictionaries, one per input of |deps|, slowest to rebuild first.
+    'unknown' counts the dependent objects missing from the log."""
+    dependents = deps.ReverseIndex()
+    object_durations = [durations.get(path) for path in deps.paths]
+    ranking = []
+    for input_id, output_ids in enumerate(dependents):
+      if not output_ids:
+        continue
+      path = deps.paths[input_id]
+      if not all_inputs and not path.endswith(HEADER_EXTENSIONS):
+        continue
+      duration = 0.0
+      unknown = 0
+      for output_id in output_ids:
+        output_duration = object_durations[output_id]
+        if output_duration is None:
+          unknown += 1
+        else:
+          duration += output_duration
+      ranking.append({
+          'path': path,
+          'duration': duration,
+          'objects': len(output_ids),
+          'unknown': unknown,
+      })
+    ranking.sort(key=lambda entry: (entry['duration'], entry['objects']),
+                 reverse=True)
+    return ranking
+def DescribePath(path):
+    """Shortens |path| for printing, like DescribeTargets."""
+    max_length = 60
+    if len(path) > max_length:
+      path = '...' + path[-(max_length - 3):]
+    return path
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-C', dest='build_directory', default='.',
+                        help='Build directory.')
+    parser.add_argument('--deps-file',
+                        help='specific ninja deps file to analyze.')
+    parser.add_argument('--log-file',
+                        help='specific ninja log file to read durations from.')
+    parser.add_argument('-n', '--count', type=int, default=long_count,
+                        help='number of headers to report.')
+    parser.add_argument('--all-inputs', action='store_true',
+                        help='rank every input, not only headers.')
+    parser.add_argument('--format', choices=('text', 'json'), default='text',
+                        help='output format.')
+    args = parser.parse_args()
+    deps_file = args.deps_file or os.path.join(args.build_directory,
+                                               '.ninja_deps')
+    log_file = args.log_file or os.path.join(args.build_directory,
+                                             '.ninja_log')
+    try:
+      durations = ReadDurations(log_file)
+    except IOError:
+      print('Log file %r not found, no header impact computed.' % log_file)
+      return errno.ENOENT
+    try:
+      with NinjaDeps(deps_file) as deps:
+        ranking = RankInputs(deps, durations, args.all_inputs)
+    except IOError:
+      print('Deps file %r not found, no header impact computed.' % deps_file)
+      return errno.ENOENT
+    except ValueError as e:
+      print('Deps file %r could not be read: %s' % (deps_file, e))
+      return errno.EINVAL
+    ranking = ranking[:args.count]
+    if args.format == 'json':
+      json.dump(ranking, sys.stdout, indent=2)
+      print()
+      return 0
+    print('    %s by compile time triggered if touched:' % (
+          'Inputs' if args.all_inputs else 'Headers'))
+    for entry in ranking:
+      unknown = (' (%d not in the log)' % entry['unknown']
+                 if entry['unknown'] else '')
+      print('      %8.1f s to rebuild %4d objects%s if %s changes' % (
+            entry['duration'], entry['objects'], unknown,
+            DescribePath(entry['path'])))
+    return 0
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,19 +14,197 @@
 
 """ Lists serial port names
 
+    Without arguments, prints a Python list of the serial port names.
+
+    --json prints the ports once as a JSON list of objects with their device,
+    VID/PID, serial number and description.
+
+    --watch stays resident: it prints a newline-delimited JSON "add" event for
+    every port, a "ready" event, then "add" and "remove" events whenever ports
+    are plugged or unplugged. On Linux hotplug is detected with pyudev when it
+    is installed, and by polling /sys/class/tty otherwise, so pyserial only
+    enumerates the ports again when something changed.
+
+    When pyserial is not installed, --watch prints an "error" event with a
+    message, --json writes the message to stderr.
+
     :raises ImportError:
         When pyserial is not installed.
     :returns:
         A list of the serial ports available on the system
 """
 
+import os
 import sys
 
-try:
+SYSFS_TTY_DIR = "/sys/class/tty"
+DEFAULT_WATCH_INTERVAL = 0.5
+USAGE = "usage: get_serial_list.py [--json | --watch [--interval SECONDS]]"
+
+
+def list_ports():
+    """Returns a dictionary mapping each port device to its description.
+
+    pyserial is imported here so that only the modes enumerating ports pay
+    for it.
+    """
     import serial.tools.list_ports
 
-    print([comport.device for comport in serial.tools.list_ports.comports()])
+    return {
+        comport.device: {
+            "device": comport.device,
+            "vid": comport.vid,
+            "pid": comport.pid,
+            "serial_number": comport.serial_number,
+            "description": comport.description,
+        }
+        for comport in serial.tools.list_ports.comports()
+    }
+
+
+def sysfs_snapshot():
+    """Returns a cheap snapshot of the tty devices known to sysfs, or None
+    when sysfs is not available.
+
+    The link target of each entry is included so that a different device
+    showing up under the same name between two polls is noticed too.
+    """
+    try:
+        names = os.listdir(SYSFS_TTY_DIR)
+    except OSError:
+        return None
+    snapshot = {}
+    for name in names:
+        try:
+            snapshot[name] = os.readlink(os.path.join(SYSFS_TTY_DIR, name))
+        except OSError:
+            snapshot[name] = None
+    return snapshot
+
+
+class PortChangeWaiter(object):
+    """Waits until the serial ports may have changed.
+
+    Uses a pyudev monitor when available, a cached sysfs snapshot on other
+    Linux systems, and otherwise simply waits for the polling interval, in
+    which case every poll enumerates the ports again.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.monitor = None
+        try:
+            import pyudev
+
+            self.monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            self.monitor.filter_by("tty")
+            self.monitor.start()
+        except Exception:
+            # pyudev is optional, and netlink may not be usable here.
+            self.monitor = None
+        self.snapshot = sysfs_snapshot() if self.monitor is None else None
+
+    def wait(self):
+        """Blocks until the ports may have changed."""
+        import time
+
+        if self.monitor is not None:
+            while self.monitor.poll() is None:
+                pass
+            # Let the burst of events of a single hotplug settle.
+            time.sleep(self.interval)
+            while self.monitor.poll(timeout=0) is not None:
+                pass
+            return
+        while True:
+            time.sleep(self.interval)
+            if self.snapshot is None:
+                return
+            snapshot = sysfs_snapshot()
+            if snapshot != self.snapshot:
+                self.snapshot = snapshot
+                return
+
+
+def emit(event, port=None):
+    """Prints a single newline-delimited JSON event."""
+    import json
+
+    message = {"event": event}
+    if port:
+        message.update(port)
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+
+def watch(interval):
+    """Prints port "add" and "remove" events until interrupted."""
+    waiter = PortChangeWaiter(interval)
+    ports = {}
+    ready = False
+    while True:
+        current = list_ports()
+        for device, port in ports.items():
+            if current.get(device) != port:
+                emit("remove", port)
+        for device, port in current.items():
+            if ports.get(device) != port:
+                emit("add", port)
+        ports = current
+        if not ready:
+            emit("ready")
+            ready = True
+        waiter.wait()
+
+
+def parse_args(argv):
+    """Returns the (mode, interval) selected by |argv|.
+
+    argparse is not used to keep the start-up of the one-shot modes minimal.
+    """
+    mode = None
+    interval = DEFAULT_WATCH_INTERVAL
+    args = iter(argv)
+    for arg in args:
+        if arg in ("--json", "--watch") and mode is None:
+            mode = arg[2:]
+        elif arg == "--interval":
+            try:
+                interval = float(next(args))
+            except (StopIteration, ValueError):
+                raise SystemExit(USAGE)
+        else:
+            raise SystemExit(USAGE)
+    return mode, interval
+
+
+def main():
+    mode, interval = parse_args(sys.argv[1:])
+
+    try:
+        if mode == "watch":
+            watch(interval)
+        elif mode == "json":
+            import json
+
+            print(json.dumps(list(list_ports().values())))
+        else:
+            print(list(list_ports()))
+    except ImportError:
+        message = "Pyserial is not installed for %s. Please, check that IDF dependencies are installed." % sys.executable
+        if mode == "watch":
+            # Keep the output parsable as newline-delimited JSON.
+            emit("error", {"message": message})
+        elif mode == "json":
+            sys.stderr.write(message + "\n")
+        else:
+            print(message)
+        return 1
+    except (KeyboardInterrupt, BrokenPipeError):
+        # The extension stops the watcher by killing it or closing its stdout.
+        pass
+    return 0
+
 
-except ImportError:
-    print("Pyserial is not installed for %s. Please, check that IDF dependencies are installed." % sys.executable)
-    sys.exit(1)
+if __name__ == "__main__":
+    sys.exit(main())